@@ -0,0 +1,78 @@
+"""Compare the memory held by loaded posts in the PostData and CompactPost layouts.
+
+Usage: python benchmarks/bench_memory.py [--posts N ...] [--json]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vault_core import CompactPost, PostData, post_to_dict  # noqa: E402
+
+PLATFORMS = ['YouTube', 'Instagram', 'Facebook', 'LinkedIn', 'Pinterest', 'Generic']
+GROUPS = ['', 'Work', 'Recipes', 'Music', 'Travel', 'Reading']
+TAGS = [f'tag{i}' for i in range(200)]
+WORDS = 'the quick brown fox jumps over lazy dog video post photo link guide review news'.split()
+
+
+def make_records(n, seed=1):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        records.append({
+            'url': f'https://example.com/post/{i}',
+            'title': ' '.join(rng.choice(WORDS) for _ in range(6)),
+            'platform': rng.choice(PLATFORMS),
+            'description': ' '.join(rng.choice(WORDS) for _ in range(20)),
+            'tags': rng.sample(TAGS, rng.randint(0, 5)),
+            'images': [f'https://cdn.example.com/img/{i}.jpg'],
+            'group': rng.choice(GROUPS),
+        })
+    # Round-trip through JSON so every record owns its strings, as after JSONStorage.load()
+    return json.dumps(records)
+
+
+def measure(record_type, payload):
+    gc.collect()
+    tracemalloc.start()
+    records = json.loads(payload)
+    start = time.perf_counter()
+    posts = [record_type(**r) for r in records]
+    elapsed = time.perf_counter() - start
+    del records
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert post_to_dict(posts[-1])['url'].endswith(str(len(posts) - 1))
+    return {'layout': record_type.__name__, 'posts': len(posts), 'bytes': current,
+            'bytes_per_post': round(current / len(posts), 1), 'peak_bytes': peak,
+            'build_seconds': round(elapsed, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines')
+    args = parser.parse_args()
+
+    for n in args.posts:
+        payload = make_records(n)
+        results = [measure(PostData, payload), measure(CompactPost, payload)]
+        results[1]['saving'] = round(1 - results[1]['bytes'] / results[0]['bytes'], 3)
+        for result in results:
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print(f"{result['layout']:<12} {n:>9} posts  {result['bytes'] / 2**20:8.1f} MiB  "
+                      f"{result['bytes_per_post']:8.1f} B/post  built in {result['build_seconds']:.2f}s"
+                      + (f"  ({result['saving']:.0%} smaller)" if 'saving' in result else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Measure cold-start time of headless commands and fail if it exceeds the budget.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--budget-ms MS] [--json]
+
+Each command runs in a fresh interpreter inside an empty scratch directory. Besides the wall
+time, the -X importtime log is checked: a headless command must never import PyQt5, and
+commands that don't touch YouTube must never import yt_dlp.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, 'app2.py')
+
+COMMANDS = {
+    'import-core': ([sys.executable, '-c', 'import vault_core'], ('PyQt5', 'yt_dlp', 'requests')),
+    'search': ([sys.executable, APP, '--search', 'fox', '--page-size', '5'], ('PyQt5', 'yt_dlp', 'requests')),
+    'search-sqlite': ([sys.executable, APP, '--storage', 'sqlite', '--search', 'fox'], ('PyQt5', 'yt_dlp', 'requests')),
+    'help': ([sys.executable, APP, '--help'], ('PyQt5', 'yt_dlp', 'requests')),
+}
+
+
+def imported_modules(command, cwd, env):
+    completed = subprocess.run([command[0], '-X', 'importtime'] + command[1:], cwd=cwd, env=env,
+                               capture_output=True, text=True)
+    modules = set()
+    for line in completed.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            modules.add(line.rsplit('|', 1)[1].strip().split('.')[0])
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Runs per command (the median is reported)')
+    parser.add_argument('--budget-ms', type=float, default=500, help='Maximum median wall time per command')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines')
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    ok = True
+    with tempfile.TemporaryDirectory(prefix='vault-startup-') as scratch:
+        for name, (command, forbidden) in COMMANDS.items():
+            times = []
+            for _ in range(max(1, args.runs)):
+                start = time.perf_counter()
+                subprocess.run(command, cwd=scratch, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                times.append(time.perf_counter() - start)
+            leaked = sorted(set(forbidden) & imported_modules(command, scratch, env))
+            median_ms = statistics.median(times) * 1000
+            passed = median_ms <= args.budget_ms and not leaked
+            ok = ok and passed
+            entry = {'benchmark': 'startup', 'command': name, 'median_ms': round(median_ms, 1),
+                     'min_ms': round(min(times) * 1000, 1), 'budget_ms': args.budget_ms,
+                     'unexpected_imports': leaked, 'passed': passed}
+            if args.json:
+                print(json.dumps(entry))
+            else:
+                print(f"{name:<14} {median_ms:8.1f} ms (min {min(times) * 1000:.1f})  "
+                      f"{'ok' if passed else 'OVER BUDGET' if not leaked else 'imports ' + ', '.join(leaked)}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
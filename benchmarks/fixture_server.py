@@ -0,0 +1,107 @@
+"""Local HTTP server replaying recorded post pages and thumbnails for the benchmarks.
+
+/<platform>/<id> serves fixtures/<platform>.html with its placeholders filled in, followed by
+a large body so head-only parsing has something to skip. /img/<id>.png serves a generated
+PNG. Every response carries an ETag and conditional requests get a 304.
+"""
+import hashlib
+import os
+import struct
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PLATFORMS = ('facebook', 'linkedin', 'pinterest', 'instagram')
+BODY_PADDING = 256 * 1024
+
+
+def make_png(width=320, height=240) -> bytes:
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    # Filter byte 0 then the RGB pixels of each row: a plain gradient
+    rows = b''.join(b'\x00' + bytes(v for x in range(width) for v in (x * 255 // width, y * 255 // height, 128))
+                    for y in range(height))
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
+
+
+class FixtureServer:
+    def __init__(self, host='127.0.0.1', port=0):
+        self.templates = {}
+        for platform in PLATFORMS:
+            with open(os.path.join(FIXTURES, platform + '.html'), 'r', encoding='utf-8') as f:
+                self.templates[platform] = f.read()
+        self.padding = ('<div class="feed-item">' + 'lorem ipsum dolor sit amet ' * 8 + '</div>\n') \
+            * (BODY_PADDING // 240) + '</body>\n</html>\n'
+        self.image = make_png()
+        self.requests = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.base = f'http://{host}:{self.httpd.server_address[1]}'
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, platform: str, post_id) -> str:
+        return f'{self.base}/{platform}/{post_id}'
+
+    def image_url(self, post_id) -> str:
+        return f'{self.base}/img/{post_id}.png'
+
+    def body(self, path: str):
+        parts = path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] in self.templates:
+            page = self.templates[parts[0]].replace('{base}', self.base).replace('{id}', parts[1])
+            return (page + self.padding).encode('utf-8'), 'text/html; charset=utf-8'
+        if len(parts) == 2 and parts[0] == 'img':
+            return self.image, 'image/png'
+        return None, None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                body, content_type = server.body(self.path)
+                with server._lock:
+                    server.requests += 1
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                etag = '"%s"' % hashlib.md5(self.path.encode('utf-8')).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    with server._lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Head-only readers hang up once they have what they need
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,249 @@
+"""Benchmark harness: fetchers against recorded pages, storage backends and the GUI table.
+
+Usage: python benchmarks/run.py [fetchers images storage display ...] [--sizes N ...]
+                                [--json] [--output results.json]
+
+Everything runs in a scratch directory against a local fixture server, so no network access
+is needed and the real vault is never touched. Qt is forced onto the offscreen platform.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import vault_core as core  # noqa: E402
+from bench_memory import make_records  # noqa: E402
+from fixture_server import FixtureServer  # noqa: E402
+
+FETCHERS = {
+    'facebook': core.FacebookFetcher,
+    'linkedin': core.LinkedInFetcher,
+    'pinterest': core.PinterestFetcher,
+    'instagram': core.InstagramFetcher,
+}
+STORAGES = {
+    'json': (core.JSONStorage, 'posts.json'),
+    'vault': (core.VaultStorage, 'posts.vault'),
+    'sqlite': (core.SQLiteStorage, 'data.db'),
+}
+QUERIES = ['fox', 'quick brown', 'tag17', 'review']
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def result(benchmark, seconds, **params):
+    entry = {'benchmark': benchmark, **params, 'seconds': round(seconds, 6)}
+    if params.get('ops'):
+        entry['ops_per_sec'] = round(params['ops'] / seconds, 1) if seconds else None
+    return entry
+
+
+def bench_fetchers(server, args):
+    results = []
+    for name, fetcher_cls in FETCHERS.items():
+        urls = [server.url(name, i) for i in range(args.urls)]
+        fetcher = fetcher_cls()
+        for phase in ('cold', 'revalidated'):
+            # The second pass hits the response cache and is answered with 304s
+            before = server.not_modified
+            with ThreadPoolExecutor(args.workers) as pool:
+                seconds, posts = timed(lambda: list(pool.map(fetcher.fetch, urls)))
+            failed = sum(post is None for post in posts)
+            results.append(result('fetch', seconds, platform=name, phase=phase, ops=len(urls),
+                                  workers=args.workers, failed=failed, not_modified=server.not_modified - before))
+    return results
+
+
+def bench_images(server, args):
+    from PyQt5 import QtWidgets
+    from vault_gui import ImageLoader
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    results = []
+    urls = [server.image_url(i) for i in range(args.urls)]
+    loader = ImageLoader(workers=4)
+    for phase in ('cold', 'disk-cache'):
+        done, failed = [], []
+        loader.finished.connect(lambda gen, row, url, image: done.append(row))
+        loader.error.connect(lambda gen, row, url: (done.append(row), failed.append(row)))
+        loader.reset()
+        start = time.perf_counter()
+        for row, url in enumerate(urls):
+            loader.request(row, url)
+        while len(done) < len(urls) and time.perf_counter() - start < 120:
+            app.processEvents()
+            time.sleep(0.001)
+        seconds = time.perf_counter() - start
+        loader.finished.disconnect()
+        loader.error.disconnect()
+        results.append(result('thumbnails', seconds, phase=phase, ops=len(urls), failed=len(failed)))
+    loader.shutdown()
+    return results
+
+
+def make_posts(n, server=None):
+    posts = [core.PostData(**record) for record in json.loads(make_records(n))]
+    if server is not None:
+        for i, post in enumerate(posts):
+            post.images = [server.image_url(i)]
+    groups = sorted({post.group for post in posts if post.group})
+    return posts, groups
+
+
+def bench_storage(server, args):
+    results = []
+    for n in args.sizes:
+        posts, groups = make_posts(n)
+        for backend in args.backends:
+            storage_cls, path = STORAGES[backend]
+            if backend == 'vault':
+                # A vault is produced from a JSON vault, the way --convert-json does it
+                core.JSONStorage('seed.json').replace_all(posts, groups)
+                seconds, _ = timed(core.VaultStorage.convert, 'seed.json', path, force=True)
+            else:
+                storage = storage_cls(path)
+                seconds, _ = timed(lambda: (storage.replace_all(posts, groups), storage.flush()))
+                if backend == 'sqlite':
+                    storage.close()
+            results.append(result('storage.save', seconds, backend=backend, posts=n))
+
+            seconds, storage = timed(storage_cls, path)
+            results.append(result('storage.load', seconds, backend=backend, posts=n))
+            first, _ = timed(storage.query_posts, QUERIES[0], limit=50)
+            results.append(result('storage.first_query', first, backend=backend, posts=n))
+            times = [timed(storage.query_posts, q, limit=50)[0] for q in QUERIES]
+            times += [timed(storage.count_posts, q)[0] for q in QUERIES]
+            results.append(result('storage.query', statistics.median(times), backend=backend, posts=n,
+                                  queries=len(times)))
+
+            updates = [storage.get_all_posts()[i] for i in range(0, n, max(1, n // 100))][:100]
+            for post in updates:
+                post.title += ' (edited)'
+            seconds, _ = timed(lambda: ([storage.update_post(p) for p in updates], storage.flush()))
+            results.append(result('storage.update', seconds, backend=backend, posts=n, ops=len(updates)))
+            if backend == 'sqlite':
+                storage.close()
+            for leftover in (path, path + '.journal', 'seed.json', 'seed.json.journal', path + '-wal', path + '-shm'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+    return results
+
+
+def bench_display(server, args):
+    from PyQt5 import QtWidgets
+    from vault_gui import PostApp
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    results = []
+    for n in args.sizes:
+        posts, groups = make_posts(n, server)
+        storage = core.JSONStorage('display.json')
+        storage.replace_all(posts, groups)
+        seconds, window = timed(lambda: PostApp(storage))
+        window.show()
+        app.processEvents()
+        results.append(result('display.open', seconds, posts=n))
+
+        scenarios = [('all', '', 0, 0), ('filter-word', 'fox', 0, 0), ('filter-tag', 'tag17', 0, 0),
+                     ('filter-narrow', 'quick brown fox', 0, 0), ('group', '', 1, 0), ('sort-platform', '', 0, 1)]
+        for label, text, group_row, sort_index in scenarios:
+            window.filter_input.blockSignals(True)
+            window.filter_input.setText(text)
+            window.filter_input.blockSignals(False)
+            window.group_list.blockSignals(True)
+            window.group_list.setCurrentRow(group_row)
+            window.group_list.blockSignals(False)
+            window.sort_box.blockSignals(True)
+            window.sort_box.setCurrentIndex(sort_index)
+            window.sort_box.blockSignals(False)
+            times = []
+            for _ in range(max(2, args.repeat)):
+                seconds, _ = timed(window.update_display)
+                app.processEvents()
+                times.append(seconds)
+            # The first run is what a user sees; repeats of the same query can reuse cached results
+            results.append(result('display.update', times[0], posts=n, scenario=label, rows=window.model.rowCount(),
+                                  repeat_median=round(statistics.median(times[1:]), 6)))
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+        for leftover in ('display.json', 'display.json.journal'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return results
+
+
+BENCHMARKS = {
+    'fetchers': bench_fetchers,
+    'images': bench_images,
+    'storage': bench_storage,
+    'display': bench_display,
+}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=HERE, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (all of them by default)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000],
+                        help='Vault sizes for the storage and display benchmarks')
+    parser.add_argument('--backends', nargs='+', choices=list(STORAGES), default=list(STORAGES))
+    parser.add_argument('--urls', type=int, default=200, help='URLs per platform for fetcher/thumbnail runs')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent fetches')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per display scenario (median is kept)')
+    parser.add_argument('--json', action='store_true', help='Print each result as a JSON line')
+    parser.add_argument('--output', type=str, help='Also write every result, with environment info, to this file')
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    output = os.path.abspath(args.output) if args.output else None
+
+    results = []
+    server = FixtureServer().start()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='vault-bench-') as scratch:
+        os.chdir(scratch)
+        try:
+            for name in args.benchmarks or list(BENCHMARKS):
+                for entry in BENCHMARKS[name](server, args):
+                    results.append(entry)
+                    if args.json:
+                        print(json.dumps(entry), flush=True)
+                    else:
+                        params = ' '.join(f'{k}={v}' for k, v in entry.items() if k not in ('benchmark', 'seconds'))
+                        print(f"{entry['benchmark']:<22} {entry['seconds'] * 1000:10.1f} ms  {params}", flush=True)
+        finally:
+            os.chdir(cwd)
+            server.stop()
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
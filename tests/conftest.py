@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The app modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vault_core  # noqa: E402
+from vault_core import HTTPClient, PostData, ResponseCache  # noqa: E402
+
+
+def make_post(n, **fields):
+    values = {'url': f'https://example.com/{n}', 'title': f'Post {n}', 'platform': 'Web',
+              'description': f'Description of post {n}', 'tags': [f'tag{n % 3}'], 'images': [], 'group': ''}
+    values.update(fields)
+    return PostData(**values)
+
+
+@pytest.fixture
+def posts():
+    return [make_post(n) for n in range(20)]
+
+
+class Site:
+    # A local web server whose pages the test sets up; it answers If-None-Match with a 304 and
+    # records every request it gets
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.server.server_address[1]}{path}'
+
+    def page(self, path, body='', status=200, headers=None):
+        headers = dict({'Content-Type': 'text/html; charset=utf-8'}, **(headers or {}))
+        self.pages[path] = (status, headers, body.encode('utf-8'))
+        return self.url(path)
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                site.requests.append((self.path, dict(self.headers)))
+                status, headers, body = site.pages.get(self.path, (404, {}, b''))
+                if headers.get('ETag') and self.headers.get('If-None-Match') == headers['ETag']:
+                    status, body = 304, b''
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def http_cache(tmp_path, monkeypatch):
+    # Fetches go through a response cache of their own instead of ./cache
+    client = HTTPClient(ResponseCache(str(tmp_path / 'http')))
+    monkeypatch.setattr(vault_core, '_client', client)
+    return client
+
+
+@pytest.fixture
+def site(http_cache):
+    site = Site()
+    yield site
+    site.close()
@@ -0,0 +1,88 @@
+import pytest
+
+from vault_core import BloomFilter, Crawler, FetchScheduler, JSONStorage, SeenURLs, normalize_url, url_key
+
+
+@pytest.mark.parametrize('url,expected', [
+    ('HTTPS://Example.COM:443/a/', 'https://example.com/a'),
+    ('http://example.com:80', 'http://example.com/'),
+    ('http://example.com:8080//a//b', 'http://example.com:8080/a/b'),
+    ('https://example.com/a?b=2&a=1#top', 'https://example.com/a?a=1&b=2'),
+    ('https://example.com/?utm_source=x&id=3&fbclid=y&gclid=z', 'https://example.com/?id=3'),
+    ('  https://example.com/a?q=  ', 'https://example.com/a?q='),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [url_key(f'https://example.com/{n}') for n in range(1000)]
+    # add() may already answer "maybe" as the filter fills up, but rarely
+    assert sum(bloom.add(key) for key in keys) < 30
+    assert all(key in bloom for key in keys)
+    others = [url_key(f'https://other.example/{n}') for n in range(10000)]
+    assert sum(key in bloom for key in others) < 300
+
+
+def test_seen_urls_persist_and_match_normalized_urls(tmp_path):
+    path = str(tmp_path / 'seen.db')
+    seen = SeenURLs(path, capacity=1000)
+    assert seen.add('https://example.com/a/')
+    assert not seen.add('https://EXAMPLE.com/a#part')
+    seen.add_many(['https://example.com/b', 'https://example.com/b?utm_medium=mail'])
+    assert len(seen) == 2
+    # A URL the Bloom filter has never seen doesn't need the index
+    lookups = seen.index_lookups
+    assert 'https://example.com/c' not in seen
+    assert seen.index_lookups == lookups
+    seen.close()
+
+    seen = SeenURLs(path, capacity=1000)
+    assert 'https://example.com/b/' in seen
+    assert not seen.add('https://example.com/a')
+    seen.close()
+
+
+def page(title, *links):
+    return (f'<html><head><title>{title}</title></head><body>'
+            + ''.join(f'<a href="{link}">{link}</a>' for link in links) + '</body></html>')
+
+
+def test_crawl_follows_links_on_the_seed_site_one_level_at_a_time(site, tmp_path):
+    seed = site.page('/', page('Home', '/a', '/a#again', '/b?utm_source=home', '/logo.png', '/missing',
+                               'https://elsewhere.example/', 'mailto:me@example.com'))
+    site.page('/a', page('A', '/c'))
+    site.page('/b', page('B', '/'))
+    site.page('/c', page('C'))
+    storage = JSONStorage(str(tmp_path / 'posts.json'))
+    seen = SeenURLs(str(tmp_path / 'seen.db'))
+    report = Crawler(storage, seen, max_depth=1, scheduler=FetchScheduler(default_rate=100.0)).crawl([seed])
+
+    assert sorted(p.title for p in storage.get_all_posts()) == ['A', 'B', 'Home']
+    assert report.failures == [(site.url('/missing'), 'no post data extracted')]
+    # /c is two links away, so it is neither fetched nor marked seen
+    assert sorted(site.paths()) == ['/', '/a', '/b', '/missing']
+    assert site.url('/c') not in seen
+    seen.close()
+
+    # A later crawl skips what this one saw, and the seed, already saved, isn't saved again
+    seen = SeenURLs(str(tmp_path / 'seen.db'))
+    report = Crawler(storage, seen, max_depth=2, scheduler=FetchScheduler(default_rate=100.0)).crawl([seed])
+    assert (report.total, report.saved, report.unchanged) == (1, 0, 1)
+    seen.close()
+
+
+def test_crawl_stops_at_the_page_budget(site, tmp_path):
+    seed = site.page('/', page('Home', *[f'/{n}' for n in range(10)]))
+    for n in range(10):
+        site.page(f'/{n}', page(f'Page {n}'))
+    storage = JSONStorage(str(tmp_path / 'posts.json'))
+    seen = SeenURLs()
+    crawler = Crawler(storage, seen, max_depth=3, max_pages=4, scheduler=FetchScheduler(default_rate=100.0))
+    report = crawler.crawl([seed])
+    assert report.total == 4
+    assert len(storage.get_all_posts()) == 4
+    # Links beyond the budget stay unseen for a bigger crawl later
+    assert site.url('/9') not in seen
+    seen.close()
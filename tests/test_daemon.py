@@ -0,0 +1,80 @@
+import http.client
+import threading
+import time
+
+import pytest
+
+import vault_daemon
+from conftest import make_post
+from vault_core import JSONStorage
+from vault_daemon import RemoteStorage, VaultClient, VaultDaemon
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    daemon = VaultDaemon(lambda: JSONStorage(str(tmp_path / 'posts.json')), listen='127.0.0.1:0')
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    yield daemon
+    daemon.shutdown()
+    thread.join()
+
+
+def request(daemon, method, path, body=b'', headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', daemon.httpd.server_address[1], timeout=10)
+    try:
+        conn.putrequest(method, path, skip_host=True)
+        for name, value in (headers or {}).items():
+            conn.putheader(name, value)
+        conn.putheader('Content-Length', str(len(body)))
+        conn.endheaders(body)
+        return conn.getresponse().status
+    finally:
+        conn.close()
+
+
+def test_foreign_host_headers_are_refused(daemon):
+    port = daemon.httpd.server_address[1]
+    for host in (f'127.0.0.1:{port}', f'localhost:{port}', f'[::1]:{port}', '127.0.0.1'):
+        assert request(daemon, 'GET', '/status', headers={'Host': host}) == 200, host
+    # A page that points its own domain at 127.0.0.1 still sends that domain
+    for host in (f'evil.example:{port}', 'evil.example', '127.0.0.1:1', f'localhost.evil.example:{port}'):
+        assert request(daemon, 'GET', '/status', headers={'Host': host}) == 403, host
+    assert request(daemon, 'GET', '/status') == 403
+
+
+def test_bodies_must_be_json(daemon):
+    host = {'Host': f'127.0.0.1:{daemon.httpd.server_address[1]}'}
+    body = b'{"posts": [{"url": "https://example.com/1"}]}'
+    # What a form or a text/plain fetch() from any web page would send, no preflight needed
+    for content_type in ('text/plain', 'application/x-www-form-urlencoded', 'multipart/form-data; boundary=x'):
+        assert request(daemon, 'POST', '/posts', body, dict(host, **{'Content-Type': content_type})) == 415
+    assert request(daemon, 'PUT', '/posts', body, host) == 415
+    assert VaultClient(daemon.address).status()['posts'] == 0
+
+    json_headers = dict(host, **{'Content-Type': 'application/json; charset=utf-8'})
+    assert request(daemon, 'POST', '/posts', body, json_headers) == 200
+    assert VaultClient(daemon.address).status()['posts'] == 1
+
+
+def test_remote_storage_round_trip(daemon):
+    storage = RemoteStorage(VaultClient(daemon.address))
+    storage.save_posts([make_post(n, group='G' if n == 1 else '') for n in range(3)])
+    storage.update_post(make_post(1, title='Edited'))
+    storage.delete_post(make_post(2).url)
+    assert storage.count_posts() == 2
+    assert [(p.title, p.group) for p in storage.query_posts('edit')] == [('Edited', '')]
+    assert [p.url for p in storage.snapshot_posts()] == [make_post(0).url, make_post(1).url]
+    assert storage.all_groups() == ['G']
+
+
+def test_only_the_latest_finished_jobs_are_kept(daemon, monkeypatch):
+    monkeypatch.setattr(vault_daemon, 'MAX_FINISHED_JOBS', 2)
+    jobs = [daemon.submit([]) for _ in range(4)]
+    deadline = time.time() + 10
+    while not all(job.finished for job in jobs) and time.time() < deadline:
+        time.sleep(0.01)
+    # Eviction runs just after a job's status turns finished
+    while len(daemon.jobs) > 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert list(daemon.jobs) == [jobs[2].id, jobs[3].id]
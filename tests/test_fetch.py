@@ -0,0 +1,114 @@
+import pytest
+import requests
+
+import vault_core
+from vault_core import (GENERIC_FETCHER, FacebookFetcher, GenericFetcher, HeadParser, InstagramFetcher,
+                        PinterestFetcher, YouTubeFetcher, detect_fetcher, fetch_head, fetcher_for_host,
+                        register_fetcher)
+
+HEAD = ('<html><head><title> A   page </title>'
+        '<meta property="og:title" content="OG title">'
+        '<meta property="OG:Description" content="Read about #python and #qt">'
+        '<meta name="og:image" content="https://cdn.example/a.jpg">'
+        '<link rel="canonical" href="https://example.com/a">'
+        '<script type="application/ld+json">{"@type": "Article", "headline": "LD"}</script>'
+        '<script type="application/ld+json">not json</script>'
+        '</head>')
+
+
+def test_head_parser_reads_meta_title_canonical_and_ld_json():
+    parser = HeadParser()
+    parser.feed(HEAD + '<body><title>Not this</title><a href="/b">b</a></body></html>')
+    assert parser.meta == {'og:title': 'OG title', 'og:description': 'Read about #python and #qt',
+                           'og:image': 'https://cdn.example/a.jpg'}
+    assert parser.title == 'A page'
+    assert parser.canonical == 'https://example.com/a'
+    assert parser.ld_json == [{'@type': 'Article', 'headline': 'LD'}]
+    assert parser.head_done
+    # Links are only gathered when a base URL is given
+    assert parser.links == []
+
+
+def test_head_parser_collects_absolute_links():
+    parser = HeadParser('https://example.com/dir/page')
+    parser.feed('<body><a href="other">1</a><a href="/root">2</a><a href="#top">3</a>'
+                '<a href="mailto:a@example.com">4</a><a href=" https://elsewhere.example/ ">5</a><a>6</a></body>')
+    assert parser.links == ['https://example.com/dir/other', 'https://example.com/root',
+                            'https://elsewhere.example/']
+
+
+def test_fetch_head_stops_reading_at_the_end_of_the_head(site):
+    url = site.page('/a', HEAD + '<body>' + 'x' * 100000
+                    + '<script type="application/ld+json">{"caption": "late"}</script></body></html>')
+    head = fetch_head(url)
+    assert head.head_done
+    assert head.ld_json == [{'@type': 'Article', 'headline': 'LD'}]
+
+    # Keeps going past </head> while until() is false
+    head = fetch_head(url, until=lambda parser: len(parser.ld_json) > 1, head_only=False)
+    assert head.ld_json[-1] == {'caption': 'late'}
+
+
+def test_opengraph_fetchers(site):
+    url = site.page('/post', HEAD + '<body></body></html>')
+    post = FacebookFetcher().fetch(url)
+    assert (post.title, post.platform, post.url) == ('Facebook Post', 'Facebook', url)
+    assert post.description == 'Read about #python and #qt'
+    assert post.tags == ['python', 'qt']
+    assert post.images == ['https://cdn.example/a.jpg']
+    # Pinterest titles come from the page
+    assert PinterestFetcher().fetch(url).title == 'OG title'
+
+
+def test_instagram_caption_may_sit_in_the_body(site):
+    url = site.page('/p/1', '<html><head><title>Instagram</title></head><body><script type="application/ld+json">'
+                    '{"caption": "Sunset #beach", "image": "https://cdn.example/s.jpg"}</script></body></html>')
+    post = InstagramFetcher().fetch(url)
+    assert (post.title, post.platform, post.description) == ('Instagram Post', 'Instagram', 'Sunset #beach')
+    assert post.tags == ['beach']
+    assert post.images == ['https://cdn.example/s.jpg']
+
+    assert InstagramFetcher().fetch(site.page('/p/2', '<html><head></head><body></body></html>')) is None
+
+
+def test_generic_post_prefers_opengraph_then_json_ld_then_html(site):
+    url = site.page('/article', '<html><head><title>Fallback</title><script type="application/ld+json">'
+                    '{"@graph": [{"@type": "WebSite", "name": "Site"}, {"@type": "NewsArticle", '
+                    '"headline": "  Big   news ", "description": "About #python", "image": {"url": "/img/a.jpg"}, '
+                    '"keywords": ["x", "y"], "publisher": {"@type": "Organization", "name": "The Paper"}}]}'
+                    '</script></head><body></body></html>')
+    post = GenericFetcher().fetch(url)
+    assert (post.title, post.description, post.platform) == ('Big news', 'About #python', 'The Paper')
+    assert post.images == [site.url('/img/a.jpg')]
+    assert post.tags == ['x', 'y', 'python']
+
+    url = site.page('/plain', '<html><head><title> Plain  page </title><meta name="description" content="Words">'
+                    '<meta name="keywords" content="k1, k2,"></head><body></body></html>')
+    post = GenericFetcher().fetch(url)
+    assert (post.title, post.description, post.tags) == ('Plain page', 'Words', ['k1', 'k2'])
+    # Without a site name the host stands in for the platform
+    assert post.platform == url.split('/')[2]
+
+    assert GenericFetcher().fetch(site.page('/untitled', '<html><head></head><body>text</body></html>')) is None
+
+
+def test_error_pages_are_not_posts(site):
+    url = site.page('/gone', '<html><head><title>404 Not Found</title></head></html>', status=404)
+    with pytest.raises(requests.HTTPError):
+        fetch_head(url)
+    assert GenericFetcher().fetch(url) is None
+    assert GenericFetcher().fetch(site.url('/never-set-up')) is None
+
+
+def test_fetchers_are_found_by_host_suffix(monkeypatch):
+    assert isinstance(detect_fetcher('https://m.youtube.com/watch?v=1'), YouTubeFetcher)
+    assert isinstance(detect_fetcher('https://WWW.Instagram.com/p/1'), InstagramFetcher)
+    assert detect_fetcher('https://notinstagram.com/p/1') is GENERIC_FETCHER
+
+    monkeypatch.setattr(vault_core, 'FETCHERS', dict(vault_core.FETCHERS))
+    custom = object()
+    try:
+        register_fetcher(['.example.org'], custom)
+        assert detect_fetcher('https://blog.example.org/post') is custom
+    finally:
+        fetcher_for_host.cache_clear()
@@ -0,0 +1,68 @@
+from vault_core import ResponseCache
+
+
+def test_cache_round_trip_and_lru_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10)
+    cache.put('https://example.com/a', b'aaaa', {'etag': '"a"'})
+    cache.put('https://example.com/b', b'bbbb', {'etag': '"b"'})
+    meta, body = cache.get('https://example.com/a')
+    assert (meta['etag'], body) == ('"a"', b'aaaa')
+    assert cache.get('https://example.com/missing') == (None, None)
+
+    # /a was read last, so /b is the one evicted
+    cache.put('https://example.com/c', b'cccc', {})
+    assert cache.get('https://example.com/b') == (None, None)
+    assert cache.get('https://example.com/a')[1] == b'aaaa'
+    assert cache.size == 8
+
+    # A new instance finds what is on disk
+    assert ResponseCache(str(tmp_path), max_bytes=10).size == 8
+
+
+def test_a_cached_page_is_revalidated_and_replayed(site, http_cache):
+    url = site.page('/a', '<html>A</html>', headers={'ETag': '"v1"'})
+    first = http_cache.get(url)
+    assert (first.status_code, first.from_cache, first.content) == (200, False, b'<html>A</html>')
+
+    second = http_cache.get(url)
+    assert site.requests[-1][1]['If-None-Match'] == '"v1"'
+    assert (second.status_code, second.from_cache, second.content) == (200, True, b'<html>A</html>')
+    assert second.headers['Content-Type'] == 'text/html; charset=utf-8'
+
+    # A changed page comes back in full and replaces the cached copy
+    site.page('/a', '<html>B</html>', headers={'ETag': '"v2"'})
+    third = http_cache.get(url)
+    assert (third.from_cache, third.content) == (False, b'<html>B</html>')
+    assert http_cache.cache.get(url)[0]['etag'] == '"v2"'
+
+
+def test_a_cached_prefix_only_serves_partial_reads(site, http_cache):
+    url = site.page('/a', 'x' * 100000, headers={'Last-Modified': 'Mon, 05 Oct 2026 10:00:00 GMT'})
+    with http_cache.get(url, partial_ok=True) as response:
+        chunks = response.iter_content(1024)
+        next(chunks)
+        chunks.close()
+    assert site.requests[-1][1].get('If-Modified-Since') is None
+    meta, body = http_cache.cache.get(url)
+    assert meta['complete'] is False and len(body) < 100000
+
+    http_cache.get(url, partial_ok=True).close()
+    assert site.requests[-1][1]['If-Modified-Since'] == 'Mon, 05 Oct 2026 10:00:00 GMT'
+    http_cache.get(url).close()
+    assert site.requests[-1][1].get('If-Modified-Since') is None
+
+
+def test_responses_without_validators_are_not_kept(site, http_cache):
+    plain = site.page('/plain', 'plain')
+    private = site.page('/private', 'private', headers={'ETag': '"p"', 'Cache-Control': 'no-store'})
+    for url in (plain, private):
+        assert http_cache.get(url).content
+        assert http_cache.cache.get(url) == (None, None)
+
+
+def test_callers_with_their_own_copy_get_a_bare_304(site, http_cache):
+    url = site.page('/image.png', 'png', headers={'ETag': '"img"'})
+    response = http_cache.get(url, validators={'etag': '"img"'})
+    assert (response.status_code, response.from_cache) == (304, False)
+    # Nor is anything cached for them
+    assert http_cache.cache.get(url) == (None, None)
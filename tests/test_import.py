@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from conftest import make_post
+from vault_core import JSONStorage, SQLiteStorage, VaultImport, export_posts, post_to_dict
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def storage(request, tmp_path):
+    if request.param == 'json':
+        yield JSONStorage(str(tmp_path / 'posts.json'))
+    else:
+        storage = SQLiteStorage(str(tmp_path / 'data.db'))
+        yield storage
+        storage.close()
+
+
+def write_ndjson(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write((line if isinstance(line, str) else json.dumps(line)) + '\n')
+    return str(path)
+
+
+def by_url(storage):
+    return {p.url: post_to_dict(p) for p in storage.get_all_posts()}
+
+
+def test_merge_adds_updates_and_deduplicates(tmp_path, storage, posts):
+    storage.save_posts([make_post(n, group='Old') for n in range(5)])
+    path = write_ndjson(tmp_path / 'export.ndjson', [
+        {'groups': ['Imported']},
+        post_to_dict(make_post(0, group='Old')),
+        post_to_dict(make_post(1, title='Changed', group='')),
+        post_to_dict(make_post(2, title='Moved', group='Imported')),
+        post_to_dict(make_post(7)),
+        post_to_dict(make_post(7, title='Second copy')),
+        'not json',
+        {'title': 'no url'},
+        {'url': 'https://example.com/bad', 'tags': 'abc'},
+    ])
+
+    report = VaultImport(storage, path, batch_size=2).run()
+
+    assert (report.read, report.added, report.updated, report.unchanged) == (5, 1, 2, 1)
+    assert (report.duplicates, report.invalid) == (1, 3)
+    posts = by_url(storage)
+    assert len(posts) == 6
+    # An imported post without a group keeps the one it had
+    assert posts[make_post(1).url]['title'] == 'Changed'
+    assert posts[make_post(1).url]['group'] == 'Old'
+    assert posts[make_post(2).url]['group'] == 'Imported'
+    assert posts[make_post(7).url]['title'] == 'Post 7'
+    assert 'https://example.com/bad' not in posts
+    assert 'Imported' in storage.all_groups()
+
+
+def test_merge_returns_what_changed(tmp_path, storage):
+    old = make_post(1)
+    storage.save_posts([old])
+    importer = VaultImport(storage, write_ndjson(tmp_path / 'empty.ndjson', []))
+    added, updated = importer.merge([make_post(1, title='New title'), make_post(2)], [])
+    assert [p.url for p in added] == [make_post(2).url]
+    assert [(o.title, n.title) for o, n in updated] == [('Post 1', 'New title')]
+
+
+def test_document_format_and_round_trip(tmp_path, storage, posts):
+    source = JSONStorage(str(tmp_path / 'source.json'))
+    source.replace_all(posts, ['Research'])
+    for name in ('export.ndjson', 'export.json'):
+        path = str(tmp_path / name)
+        assert export_posts(source.iter_posts(), source.groups, path) == len(posts)
+        report = VaultImport(storage, path).run()
+        assert report.read == len(posts)
+    assert by_url(storage) == by_url(source)
+    assert storage.all_groups() == ['Research']
+
+
+def test_json_vault_survives_a_reload_after_merging(tmp_path, posts):
+    path = str(tmp_path / 'posts.json')
+    storage = JSONStorage(path, compact_after=1000)
+    storage.save_posts(posts)
+    export = write_ndjson(tmp_path / 'export.ndjson',
+                          [post_to_dict(make_post(n, title=f'New {n}')) for n in range(0, 20, 2)])
+    assert VaultImport(storage, export).run().updated == 10
+    assert by_url(JSONStorage(path)) == by_url(storage)
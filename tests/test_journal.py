@@ -0,0 +1,106 @@
+import os
+
+from conftest import make_post
+from vault_core import JSONStorage, post_to_dict
+
+
+def state(storage):
+    return [post_to_dict(p) for p in storage.posts], list(storage.groups)
+
+
+def test_changes_are_replayed_from_the_journal(tmp_path, posts):
+    path = str(tmp_path / 'posts.json')
+    storage = JSONStorage(path, compact_after=1000)
+    storage.save_posts(posts)
+    storage.update_post(make_post(3, title='Renamed', group='Research'))
+    storage.delete_post(posts[5].url)
+    storage.add_group('Later')
+    storage.flush()
+
+    assert not os.path.exists(path)
+    reopened = JSONStorage(path)
+    assert state(reopened) == state(storage)
+    assert reopened.groups == ['Research', 'Later']
+    assert [p.title for p in reopened.posts if p.url == posts[3].url] == ['Renamed']
+
+
+def test_batched_updates_replay_in_order(tmp_path, posts):
+    path = str(tmp_path / 'posts.json')
+    storage = JSONStorage(path, compact_after=1000)
+    storage.save_posts(posts)
+    storage.update_posts([make_post(1, title='First'), make_post(2, title='Second'), make_post(99)])
+    storage.delete_post(posts[2].url)
+    storage.update_posts([make_post(1, title='Again'), make_post(2, title='Back')])
+    storage.flush()
+
+    reopened = JSONStorage(path)
+    assert state(reopened) == state(storage)
+    titles = {p.url: p.title for p in reopened.posts}
+    assert titles[posts[1].url] == 'Again'
+    assert titles[posts[2].url] == 'Back'
+    assert make_post(99).url in titles
+    assert len(reopened.posts) == len(posts) + 1
+
+
+def test_torn_last_line_is_discarded_and_truncated(tmp_path, posts):
+    path = str(tmp_path / 'posts.json')
+    storage = JSONStorage(path, compact_after=1000)
+    storage.save_posts(posts[:3])
+    storage.flush()
+    expected = state(storage)
+    good_size = os.path.getsize(storage.journal_path)
+    with open(storage.journal_path, 'ab') as f:
+        f.write(b'{"seq":4,"op":"add","post":{"url":"https://exa')
+
+    reopened = JSONStorage(path, compact_after=1000)
+    assert state(reopened) == expected
+    assert os.path.getsize(reopened.journal_path) == good_size
+
+    # The journal carries on cleanly after the truncation
+    reopened.save_post(posts[3])
+    reopened.flush()
+    assert [p.url for p in JSONStorage(path).posts] == [p.url for p in posts[:4]]
+
+
+def test_corrupt_line_drops_everything_after_it(tmp_path, posts):
+    path = str(tmp_path / 'posts.json')
+    storage = JSONStorage(path, compact_after=1000)
+    storage.save_posts(posts[:2])
+    storage.flush()
+    with open(storage.journal_path, 'ab') as f:
+        f.write(b'not json\n')
+        f.write(b'{"seq":3,"op":"group","name":"Lost"}\n')
+
+    reopened = JSONStorage(path)
+    assert [p.url for p in reopened.posts] == [p.url for p in posts[:2]]
+    assert reopened.groups == []
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path, posts):
+    path = str(tmp_path / 'posts.json')
+    storage = JSONStorage(path, compact_after=5)
+    storage.save_posts(posts[:5])
+    for n in range(6):
+        storage.update_post(make_post(n % 5, title=f'Version {n}'))
+    storage.flush()
+
+    assert os.path.exists(path)
+    # Compacted once the journal outgrew the five posts; only later changes are left in it
+    with open(storage.journal_path, 'rb') as f:
+        assert len(f.readlines()) == 5
+    assert state(JSONStorage(path)) == state(storage)
+
+
+def test_entries_already_in_the_snapshot_are_skipped(tmp_path, posts):
+    # A crash between writing the snapshot and truncating the journal leaves both
+    path = str(tmp_path / 'posts.json')
+    storage = JSONStorage(path, compact_after=1000)
+    storage.save_posts(posts[:4])
+    storage.flush()
+    with open(storage.journal_path, 'rb') as f:
+        journal = f.read()
+    storage.compact()
+    with open(storage.journal_path, 'wb') as f:
+        f.write(journal)
+
+    assert [p.url for p in JSONStorage(path).posts] == [p.url for p in posts[:4]]
@@ -0,0 +1,71 @@
+import pytest
+
+import vault_core
+from conftest import make_post
+from vault_core import JSONStorage, RefreshJob, RefreshState
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = RefreshState(str(tmp_path / 'refresh.db'))
+    yield state
+    state.close()
+
+
+class PageFetcher:
+    # Serves whatever the test puts in `pages`; a URL missing from it is a dead link
+    def __init__(self, pages):
+        self.pages = pages
+
+    def fetch(self, url):
+        if url not in self.pages:
+            raise ValueError('HTTP 404')
+        return make_post(0, **dict(self.pages[url], url=url))
+
+
+def test_stale_puts_unchecked_posts_first_then_the_oldest(state):
+    urls = [make_post(n).url for n in range(4)]
+    state.mark([(urls[2], None)])
+    state.conn.execute('UPDATE refresh SET checked = 100 WHERE url = ?', (urls[2],))
+    state.mark([(urls[3], 'hash')])
+    assert state.stale(urls, max_age=3600) == [urls[0], urls[1], urls[2]]
+    assert state.stale(urls, max_age=3600, limit=1) == [urls[0]]
+    assert state.hash(urls[3]) == 'hash'
+
+
+def test_refresh_writes_only_changed_posts(tmp_path, state, monkeypatch):
+    storage = JSONStorage(str(tmp_path / 'posts.json'))
+    storage.save_posts([make_post(n, group='Saved') for n in range(3)])
+    fetcher = PageFetcher({
+        make_post(0).url: vars(make_post(0)),
+        make_post(1).url: dict(vars(make_post(1)), title='New title'),
+    })
+    monkeypatch.setattr(vault_core, 'detect_fetcher', lambda url: fetcher)
+    updated = []
+    monkeypatch.setattr(storage, 'update_post', lambda post: updated.append(post))
+
+    report = RefreshJob(storage, state).refresh()
+    assert (report.total, report.saved, report.unchanged) == (3, 1, 1)
+    assert report.failures == [(make_post(2).url, 'HTTP 404')]
+    # The group is the user's, so the refreshed post keeps it
+    assert [(p.url, p.title, p.group) for p in updated] == [(make_post(1).url, 'New title', 'Saved')]
+
+    # Every post was checked, the dead link included, so nothing is stale now
+    assert RefreshJob(storage, state).select() == []
+    assert RefreshJob(storage, state, max_age=0).select() != []
+
+
+def test_apply_takes_the_changes_instead_of_the_storage(tmp_path, state, monkeypatch):
+    storage = JSONStorage(str(tmp_path / 'posts.json'))
+    storage.save_post(make_post(1))
+    fetcher = PageFetcher({make_post(1).url: dict(vars(make_post(1)), description='Changed')})
+    monkeypatch.setattr(vault_core, 'detect_fetcher', lambda url: fetcher)
+    applied = []
+
+    job = RefreshJob(storage, state, apply=applied.append)
+    report = job.run(job.select())
+    assert report.saved == 1
+    assert [p.description for p in applied] == ['Changed']
+    assert storage.get_all_posts()[0].description == 'Description of post 1'
+    # The next refresh compares against the hash recorded for the change
+    assert RefreshJob(storage, state, max_age=0, apply=applied.append).refresh().unchanged == 1
@@ -0,0 +1,97 @@
+import pytest
+
+from conftest import make_post
+from vault_core import JSONStorage, SearchIndex, SQLiteStorage
+
+
+def urls(posts):
+    return [p.url for p in posts]
+
+
+@pytest.fixture
+def library():
+    return [
+        make_post(0, title='Quick brown fox', platform='YouTube', tags=['animals'], group='Nature'),
+        make_post(1, title='Banana bread recipe', platform='Web', tags=['baking', 'recipes'], group='Food'),
+        make_post(2, title='Foxglove in the garden', platform='Instagram', tags=['plants'], group='Nature'),
+        make_post(3, title='apple pie', platform='Web', tags=['Baking'], group=''),
+    ]
+
+
+def test_search_matches_substrings_of_title_platform_tags_and_group(library):
+    index = SearchIndex(library)
+    assert urls(index.search('fox')) == urls([library[2], library[0]])
+    assert urls(index.search('BAKING')) == urls([library[3], library[1]])
+    assert urls(index.search('youtube')) == urls([library[0]])
+    assert urls(index.search('natu')) == urls([library[2], library[0]])
+    assert urls(index.search('bread rec')) == urls([library[1]])
+    # The description isn't searched, and matches don't span fields
+    assert index.search('description') == []
+    assert index.search('fox youtube') == []
+
+
+def test_filters_and_sort_orders(library):
+    index = SearchIndex(library)
+    assert urls(index.search()) == urls([library[3], library[1], library[2], library[0]])
+    assert urls(index.search(group='Nature')) == urls([library[2], library[0]])
+    assert urls(index.search('', platform='web')) == urls([library[3], library[1]])
+    assert urls(index.search('o', group='Nature', platform='YouTube')) == urls([library[0]])
+    assert [p.platform for p in index.search(sort_by='platform')] == ['Instagram', 'Web', 'Web', 'YouTube']
+    assert [p.group for p in index.search(sort_by='group')] == ['', 'Food', 'Nature', 'Nature']
+
+
+def test_add_remove_and_update(library):
+    index = SearchIndex(library[:2])
+    assert urls(index.search('fox')) == urls([library[0]])
+
+    index.add(library[2])
+    assert urls(index.search('fox')) == urls([library[2], library[0]])
+    assert len(index) == 3
+
+    index.remove(library[0])
+    assert urls(index.search('fox')) == urls([library[2]])
+    assert urls(index.search(group='Nature')) == urls([library[2]])
+    index.remove(library[0])
+    assert len(index) == 2
+
+    renamed = make_post(2, title='Roses', platform='Instagram', tags=['plants'], group='Nature')
+    index.remove(library[2])
+    index.add(renamed)
+    assert index.search('fox') == []
+    assert urls(index.search('roses')) == [renamed.url]
+
+
+def test_narrowing_queries_reuse_previous_results():
+    posts = [make_post(n, title=f'title {n}') for n in range(200)]
+    index = SearchIndex(posts)
+    assert len(index.search('t')) == 200
+    assert len(index.search('ti')) == 200
+    assert urls(index.search('title 19')) == urls([posts[19]] + posts[190:200])
+    index.remove(posts[190])
+    assert urls(index.search('title 19')) == urls([posts[19]] + posts[191:200])
+
+
+def test_many_removals_rebuild_the_index():
+    posts = [make_post(n, title=f'item {n}') for n in range(3000)]
+    index = SearchIndex(posts)
+    for post in posts[:2000]:
+        index.remove(post)
+    assert len(index) == 1000
+    assert urls(index.search('item 2999')) == [posts[2999].url]
+    assert index.search('item 5') == []
+
+
+@pytest.mark.parametrize('text,group', [('', None), ('fox', None), ('web', None), ('baking', None), ('ba', None),
+                                        ('re', 'Nature'), ('nature', None), ('bread rec', None), ('zzz', None)])
+def test_sqlite_matches_the_same_posts(tmp_path, library, text, group):
+    json_storage = JSONStorage(str(tmp_path / 'posts.json'))
+    json_storage.replace_all(library, [])
+    sqlite_storage = SQLiteStorage(str(tmp_path / 'data.db'))
+    sqlite_storage.save_posts(library)
+    try:
+        expected = json_storage.query_posts(text, group=group)
+        assert sorted(urls(sqlite_storage.query_posts(text, group=group))) == sorted(urls(expected))
+        assert sqlite_storage.count_posts(text, group=group) == len(expected)
+        assert sorted(urls(sqlite_storage.search_posts(text, group=group))) == sorted(urls(expected))
+    finally:
+        sqlite_storage.close()
@@ -0,0 +1,76 @@
+import pytest
+
+from conftest import make_post
+from vault_core import JSONStorage, PostData, VaultSnapshot, VaultStorage, post_to_dict
+
+
+def test_round_trip(tmp_path, posts):
+    posts[0] = make_post(0, title='Ünïcode 🦊', tags=[], images=['https://example.com/a.png', 'b.png'])
+    posts[1] = make_post(1, description='long ' * 500, group='Research', tags=['x', 'y', 'z'])
+    path = str(tmp_path / 'posts.vault')
+    VaultSnapshot.write(path, posts, ['Research', 'Empty'], journal_seq=42)
+
+    snapshot = VaultSnapshot(path)
+    try:
+        assert len(snapshot) == len(posts)
+        assert snapshot.groups == ['Research', 'Empty']
+        assert snapshot.journal_seq == 42
+        for i, post in enumerate(posts):
+            assert snapshot.url(i) == post.url
+            assert post_to_dict(snapshot.post(i)) == post_to_dict(post)
+            assert isinstance(snapshot.post(i), PostData)
+    finally:
+        snapshot.close()
+
+
+def test_orders_match_the_search_index_sort(tmp_path):
+    posts = [make_post(n, title=title, platform=platform, group=group)
+             for n, (title, platform, group) in enumerate([('banana', 'YouTube', 'b'), ('Apple', 'web', ''),
+                                                           ('cherry', 'Instagram', 'a'), ('apple', 'Web', 'a')])]
+    path = str(tmp_path / 'posts.vault')
+    VaultSnapshot.write(path, posts, [])
+
+    snapshot = VaultSnapshot(path)
+    try:
+        assert list(snapshot.order('title')) == [1, 3, 0, 2]
+        assert list(snapshot.order('platform')) == [2, 1, 3, 0]
+        assert list(snapshot.order('group')) == [1, 2, 3, 0]
+    finally:
+        snapshot.close()
+
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / 'posts.vault')
+    VaultSnapshot.write(path, [], [])
+    snapshot = VaultSnapshot(path)
+    try:
+        assert len(snapshot) == 0
+        assert snapshot.groups == []
+    finally:
+        snapshot.close()
+
+
+def test_vault_storage_reads_lazily_and_replays_its_journal(tmp_path, posts):
+    path = str(tmp_path / 'posts.vault')
+    VaultSnapshot.write(path, posts, [])
+    storage = VaultStorage(path, compact_after=1000)
+    assert [p.url for p in storage.iter_posts()] == [p.url for p in posts]
+    # Streaming reads don't keep what they decoded
+    assert all(type(item) is int for item in storage.posts._items)
+
+    storage.update_post(make_post(4, title='Changed'))
+    storage.flush()
+    reopened = VaultStorage(path)
+    assert reopened.posts[4].title == 'Changed'
+    reopened.compact()
+    assert VaultStorage(path).posts[4].title == 'Changed'
+
+
+def test_convert_refuses_to_overwrite(tmp_path, posts):
+    json_path, vault_path = str(tmp_path / 'posts.json'), str(tmp_path / 'posts.vault')
+    JSONStorage(json_path).replace_all(posts, ['Research'])
+    assert VaultStorage.convert(json_path, vault_path) == len(posts)
+    with pytest.raises(FileExistsError):
+        VaultStorage.convert(json_path, vault_path)
+    assert VaultStorage.convert(json_path, vault_path, force=True) == len(posts)
+    assert [post_to_dict(p) for p in VaultStorage(vault_path).posts] == [post_to_dict(p) for p in posts]
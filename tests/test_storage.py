@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from conftest import make_post
+from vault_core import JSONStorage, SQLiteStorage, VaultSnapshot, VaultStorage
+
+
+@pytest.fixture(params=['json', 'vault', 'sqlite'])
+def reopen(request, tmp_path):
+    # Returns a function that opens the same vault again, as a restart would
+    opened = []
+
+    def open_storage():
+        if request.param == 'json':
+            storage = JSONStorage(str(tmp_path / 'posts.json'))
+        elif request.param == 'vault':
+            path = tmp_path / 'posts.vault'
+            if not path.exists():
+                VaultSnapshot.write(str(path), [], [])
+            storage = VaultStorage(str(path))
+        else:
+            storage = SQLiteStorage(str(tmp_path / 'data.db'))
+        opened.append(storage)
+        return storage
+
+    yield open_storage
+    for storage in opened:
+        if isinstance(storage, SQLiteStorage):
+            storage.close()
+
+
+def stored(storage):
+    return [(p.url, p.title, p.group) for p in storage.get_all_posts()]
+
+
+def test_saving_a_known_url_replaces_its_record(reopen):
+    storage = reopen()
+    storage.save_post(make_post(1, group='Research'))
+    storage.save_post(make_post(1, title='Fetched again'))
+    storage.save_posts([make_post(2), make_post(1, title='Third time')])
+    storage.flush()
+
+    # A post saved without a group keeps the one it had
+    expected = [(make_post(1).url, 'Third time', 'Research'), (make_post(2).url, 'Post 2', '')]
+    assert sorted(stored(storage)) == expected
+    assert sorted(stored(reopen())) == expected
+
+
+def test_saving_after_a_delete_adds_the_url_again(reopen):
+    storage = reopen()
+    storage.save_post(make_post(1))
+    storage.delete_post(make_post(1).url)
+    storage.save_post(make_post(1, title='Back'))
+    storage.flush()
+    assert stored(reopen()) == [(make_post(1).url, 'Back', '')]
+
+
+def test_snapshot_is_unaffected_by_later_changes(reopen):
+    storage = reopen()
+    storage.save_posts([make_post(n) for n in range(3)])
+    snapshot = storage.snapshot_posts()
+    storage.delete_post(make_post(0).url)
+    storage.save_post(make_post(3))
+
+    # Read on another thread, as ExportWorker does
+    result = []
+    thread = threading.Thread(target=lambda: result.extend(p.url for p in snapshot))
+    thread.start()
+    thread.join()
+    assert result == [make_post(n).url for n in range(3)]
+    assert storage.count_posts() == 3
+
+
+def test_updating_a_post_replaces_its_group(reopen):
+    storage = reopen()
+    storage.save_post(make_post(1, group='Research'))
+    storage.update_post(make_post(1, title='Edited'))
+    storage.update_posts([make_post(2, group='Later')])
+    storage.flush()
+
+    expected = [(make_post(1).url, 'Edited', ''), (make_post(2).url, 'Post 2', 'Later')]
+    assert sorted(stored(storage)) == expected
+    assert sorted(stored(reopen())) == expected
+    assert 'Later' in storage.all_groups()
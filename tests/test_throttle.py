@@ -0,0 +1,102 @@
+import json
+import time
+
+import pytest
+
+import vault_core
+from conftest import make_post
+from vault_core import (BulkIngestor, FetchScheduler, HostThrottle, JSONStorage, RetryableFetchError, RetryQueue,
+                        TokenBucket, fetch_head)
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=2.0, burst=2)
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert 0.4 < bucket.take() <= 0.5
+    # A second later two more tokens have come in
+    bucket.stamp -= 1
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert bucket.take() > 0
+
+
+def test_host_throttle_grows_concurrency_and_backs_off():
+    throttle = HostThrottle(rate=100.0, max_concurrency=4)
+    assert throttle.ready(0) == 0
+    assert throttle.ready(1) == float('inf')
+    for _ in range(20):
+        throttle.success(0.1)
+    assert throttle.limit == 4
+    probed = throttle.bucket.rate
+    assert probed > 100.0
+
+    throttle.failure(retry_after=30)
+    assert throttle.limit == 2
+    assert throttle.bucket.rate == probed / 2
+    assert 29 < throttle.ready(0) <= 30
+
+
+def test_scheduler_matches_hosts_by_suffix():
+    scheduler = FetchScheduler(rates={'facebook.com': 0.5}, default_rate=3.0, max_per_host=2)
+    assert scheduler.throttle('m.facebook.com').base_rate == 0.5
+    assert scheduler.throttle('facebook.com') is not scheduler.throttle('m.facebook.com')
+    assert scheduler.throttle('notfacebook.com').base_rate == 3.0
+
+
+def test_retry_queue_persists_and_gives_up(tmp_path):
+    path = str(tmp_path / 'retry.json')
+    queue = RetryQueue(path, max_attempts=3)
+    assert queue.schedule('https://a.example/', 'G', 'HTTP 503', retry_after=0) == 0
+    assert queue.schedule('https://b.example/', '', 'HTTP 429', retry_after=3600) == 3600
+    assert [e['url'] for e in queue.due()] == ['https://a.example/']
+
+    reopened = RetryQueue(path, max_attempts=3)
+    assert len(reopened) == 2
+    assert reopened.entries['https://a.example/']['group'] == 'G'
+    assert reopened.schedule('https://a.example/', 'G', 'HTTP 503') is not None
+    assert reopened.schedule('https://a.example/', 'G', 'HTTP 503') is None
+    reopened.discard('https://b.example/')
+    with open(path) as f:
+        assert json.load(f) == []
+
+
+def test_throttling_answers_are_retryable(site):
+    with pytest.raises(RetryableFetchError) as e:
+        fetch_head(site.page('/busy', status=503, headers={'Retry-After': '7'}))
+    assert e.value.retry_after == 7
+    date = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() + 120))
+    with pytest.raises(RetryableFetchError) as e:
+        fetch_head(site.page('/slow-down', status=429, headers={'Retry-After': date}))
+    assert 100 < e.value.retry_after <= 120
+
+
+class FlakyFetcher:
+    # Fails each URL `failures` times before it returns a post
+    def __init__(self, failures, retry_after):
+        self.failures = failures
+        self.retry_after = retry_after
+        self.calls = []
+
+    def fetch(self, url):
+        self.calls.append(url)
+        if self.calls.count(url) <= self.failures:
+            raise RetryableFetchError('HTTP 503', self.retry_after)
+        return make_post(0, url=url)
+
+
+def test_bulk_ingestor_retries_within_the_run(tmp_path, monkeypatch):
+    fetcher = FlakyFetcher(failures=1, retry_after=0)
+    monkeypatch.setattr(vault_core, 'detect_fetcher', lambda url: fetcher)
+    storage = JSONStorage(str(tmp_path / 'posts.json'))
+    report = BulkIngestor(storage, scheduler=FetchScheduler(default_rate=100.0)).run(
+        ['https://a.example/1', 'https://b.example/1'])
+    assert (report.saved, report.retried, report.failures) == (2, 2, [])
+    assert sorted(p.url for p in storage.get_all_posts()) == ['https://a.example/1', 'https://b.example/1']
+
+
+def test_bulk_ingestor_leaves_late_retries_for_the_next_run(tmp_path, monkeypatch):
+    fetcher = FlakyFetcher(failures=1, retry_after=3600)
+    monkeypatch.setattr(vault_core, 'detect_fetcher', lambda url: fetcher)
+    queue = RetryQueue(str(tmp_path / 'retry.json'))
+    report = BulkIngestor(JSONStorage(str(tmp_path / 'posts.json')), retry_queue=queue).run(['https://a.example/1'])
+    assert (report.saved, report.deferred) == (0, 1)
+    assert list(RetryQueue(str(tmp_path / 'retry.json')).entries) == ['https://a.example/1']
@@ -0,0 +1,2902 @@
+import os
+import sys
+import json
+import hashlib
+import sqlite3
+import codecs
+import functools
+import mmap
+import struct
+import zlib
+import multiprocessing
+import heapq
+import math
+import random
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict, deque
+from collections.abc import MutableSequence, Sequence
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from itertools import compress, repeat
+from operator import contains
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+from email.utils import parsedate_to_datetime
+import re
+import threading
+import time
+import queue
+
+if TYPE_CHECKING:
+    import requests
+
+# Storage, search and fetching without any GUI code. Qt is never imported here, and the heavy
+# third-party modules (requests, yt_dlp) are imported inside the functions that need them, so
+# headless commands only pay for what the URLs they touch actually use.
+
+class _NullTimer:
+    # Shared stand-in handed out while metrics are off: entering and leaving it does nothing
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def record(self):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    # Context manager that can be entered many times (e.g. once per chunk) and records the
+    # accumulated time as one observation, either on a single exit or on record()
+    __slots__ = ('metrics', 'family', 'stage', 'total', 'started', 'single')
+
+    def __init__(self, metrics, family, stage, single):
+        self.metrics = metrics
+        self.family = family
+        self.stage = stage
+        self.total = 0.0
+        self.single = single
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.total += time.perf_counter() - self.started
+        if self.single:
+            self.record()
+        return False
+
+    def record(self):
+        self.metrics.observe(self.family, self.stage, self.total)
+
+class Metrics:
+    # Counters and latency histograms keyed by (family, stage), e.g. ('fetch', 'parse').
+    # Disabled by default: timers are a shared no-op object and count()/observe() return at once.
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, namespace='linksvault'):
+        self.namespace = namespace
+        self.enabled = False
+        self.counters = defaultdict(int)
+        self.histograms = {}  # (family, stage) -> [count, sum, max, bucket counts...]
+        self._lock = threading.Lock()
+
+    def timed(self, family: str, stage: str = ''):
+        return _Timer(self, family, stage, True) if self.enabled else _NULL_TIMER
+
+    def stopwatch(self, family: str, stage: str = ''):
+        return _Timer(self, family, stage, False) if self.enabled else _NULL_TIMER
+
+    def count(self, family: str, stage: str = '', value=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[(family, stage)] += value
+
+    def observe(self, family: str, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        bucket = bisect_left(self.BUCKETS, seconds)
+        with self._lock:
+            histogram = self.histograms.get((family, stage))
+            if histogram is None:
+                histogram = self.histograms[(family, stage)] = [0, 0.0, 0.0] + [0] * (len(self.BUCKETS) + 1)
+            histogram[0] += 1
+            histogram[1] += seconds
+            histogram[2] = max(histogram[2], seconds)
+            histogram[3 + bucket] += 1
+
+    def instrument(self, obj, family: str, names):
+        # Wraps the named methods of one instance, so objects created while profiling is off pay nothing
+        for name in names:
+            method = getattr(obj, name, None)
+            if method is None:
+                continue
+
+            def wrapper(*args, _method=method, _name=name, **kwargs):
+                with self.timed(family, _name):
+                    return _method(*args, **kwargs)
+            setattr(obj, name, functools.wraps(method)(wrapper))
+        return obj
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def _quantile(self, histogram, q) -> float:
+        # Upper bound of the bucket holding the q-th observation
+        target = q * histogram[0]
+        seen = 0
+        for bound, hits in zip(self.BUCKETS + (histogram[2],), histogram[3:]):
+            seen += hits
+            if seen >= target:
+                return min(bound, histogram[2])
+        return histogram[2]
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {key: list(value) for key, value in self.histograms.items()}
+        return {
+            'counters': [{'family': f, 'stage': s, 'value': v} for (f, s), v in sorted(counters.items())],
+            'histograms': [{'family': f, 'stage': s, 'count': h[0], 'sum': h[1], 'max': h[2],
+                            'p50': self._quantile(h, 0.5), 'p95': self._quantile(h, 0.95),
+                            'buckets': dict(zip([str(b) for b in self.BUCKETS] + ['+Inf'], h[3:]))}
+                           for (f, s), h in sorted(histograms.items())],
+        }
+
+    def to_prometheus(self) -> str:
+        data = self.to_dict()
+        lines = []
+        for family in sorted({c['family'] for c in data['counters']}):
+            name = f'{self.namespace}_{family}_total'
+            lines.append(f'# TYPE {name} counter')
+            for c in data['counters']:
+                if c['family'] == family:
+                    lines.append(f'{name}{{stage="{c["stage"]}"}} {c["value"]}')
+        for family in sorted({h['family'] for h in data['histograms']}):
+            name = f'{self.namespace}_{family}_seconds'
+            lines.append(f'# TYPE {name} histogram')
+            for h in data['histograms']:
+                if h['family'] != family:
+                    continue
+                cumulative = 0
+                for bound, hits in h['buckets'].items():
+                    cumulative += hits
+                    lines.append(f'{name}_bucket{{stage="{h["stage"]}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{h["stage"]}"}} {h["sum"]:.6f}')
+                lines.append(f'{name}_count{{stage="{h["stage"]}"}} {h["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def report(self) -> str:
+        # Per-stage breakdown for --profile, slowest stages (by total time) first
+        data = self.to_dict()
+        lines = [f"{'stage':<32} {'calls':>8} {'total s':>10} {'mean ms':>10} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for h in sorted(data['histograms'], key=lambda h: -h['sum']):
+            label = f"{h['family']}.{h['stage']}" if h['stage'] else h['family']
+            lines.append(f"{label:<32} {h['count']:>8} {h['sum']:>10.3f} {h['sum'] / h['count'] * 1000:>10.2f} "
+                         f"{h['p50'] * 1000:>9.2f} {h['p95'] * 1000:>9.2f} {h['max'] * 1000:>9.2f}")
+        if data['counters']:
+            lines.append('')
+            for c in data['counters']:
+                label = f"{c['family']}.{c['stage']}" if c['stage'] else c['family']
+                lines.append(f"{label:<32} {c['value']:>8}")
+        return '\n'.join(lines)
+
+METRICS = Metrics()
+
+@dataclass
+class PostData:
+    url: str
+    title: str
+    platform: str
+    description: str
+    tags: List[str]
+    images: List[str]
+    group: str = ""  # New field for grouping
+
+POST_FIELDS = ('url', 'title', 'platform', 'description', 'tags', 'images', 'group')
+
+def post_to_dict(post) -> dict:
+    # asdict() only understands dataclasses; this also covers CompactPost
+    return {name: getattr(post, name) for name in POST_FIELDS}
+
+class StringTable:
+    # Intern pool handing out small integer ids for repeated values (platforms, groups, tags)
+    def __init__(self):
+        self.values: List[str] = []
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def id(self, value: str) -> int:
+        string_id = self._ids.get(value)
+        if string_id is None:
+            with self._lock:
+                string_id = self._ids.get(value)
+                if string_id is None:
+                    string_id = len(self.values)
+                    self.values.append(sys.intern(value))
+                    self._ids[value] = string_id
+        return string_id
+
+    def __getitem__(self, string_id: int) -> str:
+        return self.values[string_id]
+
+    def __len__(self):
+        return len(self.values)
+
+STRINGS = StringTable()
+
+class CompactPost:
+    # Memory-lean drop-in for PostData when holding very large vaults: no per-instance __dict__,
+    # platform/group/tags are ids into STRINGS (tags packed into one bytes object), and images
+    # are kept as a bare string in the common single-image case. Reading .tags/.images builds
+    # a fresh list, so assign the attribute rather than mutating the returned list.
+    __slots__ = ('url', 'title', 'description', '_platform', '_group', '_tags', '_images')
+
+    def __init__(self, url, title, platform, description, tags, images, group=""):
+        self.url = url
+        self.title = title
+        self.description = description
+        self.platform = platform
+        self.group = group
+        self.tags = tags
+        self.images = images
+
+    @classmethod
+    def from_post(cls, post) -> 'CompactPost':
+        return cls(post.url, post.title, post.platform, post.description, post.tags, post.images, post.group)
+
+    @property
+    def platform(self) -> str:
+        return STRINGS[self._platform]
+
+    @platform.setter
+    def platform(self, value):
+        self._platform = STRINGS.id(value)
+
+    @property
+    def group(self) -> str:
+        return STRINGS[self._group]
+
+    @group.setter
+    def group(self, value):
+        self._group = STRINGS.id(value)
+
+    @property
+    def tags(self) -> List[str]:
+        ids = array('I')
+        ids.frombytes(self._tags)
+        return [STRINGS[i] for i in ids]
+
+    @tags.setter
+    def tags(self, values):
+        self._tags = array('I', [STRINGS.id(v) for v in values]).tobytes()
+
+    @property
+    def images(self) -> List[str]:
+        images = self._images
+        if images is None:
+            return []
+        return [images] if isinstance(images, str) else list(images)
+
+    @images.setter
+    def images(self, values):
+        values = list(values)
+        self._images = None if not values else values[0] if len(values) == 1 else tuple(values)
+
+    def __eq__(self, other):
+        if not isinstance(other, (CompactPost, PostData)):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in POST_FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in POST_FIELDS)
+        return f'CompactPost({fields})'
+
+class StorageInterface(ABC):
+    @abstractmethod
+    def save_post(self, post: PostData): pass
+
+    @abstractmethod
+    def get_all_posts(self) -> List[PostData]: pass
+
+    @abstractmethod
+    def query_posts(self, text='', group=None, platform=None, sort_by='title', limit=100, offset=0) -> List[PostData]: pass
+
+    @abstractmethod
+    def count_posts(self, text='', group=None, platform=None) -> int: pass
+
+    # Single-record changes, so callers like PostApp never have to rewrite the whole vault
+
+    @abstractmethod
+    def update_post(self, post: PostData): pass
+
+    def update_posts(self, posts: List[PostData]):
+        # Storages that would otherwise look every post up separately override this
+        for post in posts:
+            self.update_post(post)
+
+    @abstractmethod
+    def delete_post(self, url: str): pass
+
+    @abstractmethod
+    def add_group(self, name: str): pass
+
+    @abstractmethod
+    def replace_all(self, posts: List[PostData], groups: List[str]): pass
+
+    def save_posts(self, posts: List[PostData]):
+        for post in posts:
+            self.save_post(post)
+
+    def flush(self):
+        # Storages that write in the background block here until everything submitted is on disk
+        pass
+
+    def ordered_posts(self, sort_by='title'):
+        # Storages that can list every post in sort order without loading them return a lazy sequence
+        return None
+
+    def search_posts(self, text='', group=None, platform=None, sort_by='title'):
+        # Storages that can filter without an in-memory SearchIndex return every match as a lazy sequence
+        return None
+
+    def post_urls(self):
+        return (post.url for post in self.get_all_posts())
+
+    def iter_posts(self, batch_size=1000):
+        # Storages that can read their posts a batch at a time override this
+        return iter(self.get_all_posts())
+
+    def snapshot_posts(self):
+        # Every post as of now, for reading on another thread while this storage keeps changing
+        return list(self.iter_posts())
+
+    def get_posts(self, urls) -> dict:
+        wanted = set(urls)
+        return {post.url: post for post in self.get_all_posts() if post.url in wanted}
+
+class JSONStorage(StorageInterface):
+    # posts.json is a snapshot. Every change after it is appended as one NDJSON line to
+    # posts.json.journal and replayed on load; once the journal outgrows the vault it is
+    # folded into a new snapshot, which is written to a temp file and renamed into place.
+    def __init__(self, filename='posts.json', compact_after=1000, record_type=PostData):
+        self.filename = filename
+        self.record_type = record_type
+        self.journal_path = filename + '.journal'
+        self.compact_after = compact_after
+        self._journal = None
+        self._index = None
+        self._url_set = None
+        self.load()
+
+    def load(self):
+        self._index = None
+        self._url_set = None
+        try:
+            with open(self.filename, 'r') as f:
+                data = json.load(f)
+            self.posts = [self.record_type(**p) for p in data.get("posts", [])]
+            self.groups = data.get("groups", [])
+            self._seq = data.get("journal_seq", 0)
+        except Exception:
+            self.posts = []
+            self.groups = []
+            self._seq = 0
+        self._replay()
+
+    def _replay(self):
+        snapshot_seq = self._seq
+        self._pending = 0
+        good = 0
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return
+        updates = []
+        with f:
+            for line in f:
+                # A crash can leave a torn last line; it and anything after it are discarded
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                good += len(line)
+                # Entries already folded into the snapshot (crash between rename and truncate)
+                if entry['seq'] <= snapshot_seq:
+                    continue
+                # Runs of updates (an import, say) are applied together, in one pass over the vault
+                if entry['op'] == 'update':
+                    updates.append(self.record_type(**entry['post']))
+                else:
+                    self._update_many(updates)
+                    updates = []
+                    self._apply(entry)
+                self._seq = entry['seq']
+                self._pending += 1
+            self._update_many(updates)
+        if good < os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(good)
+
+    def _apply(self, entry):
+        op = entry['op']
+        if op == 'add':
+            self._add(self.record_type(**entry['post']))
+        elif op == 'update':
+            self._update(self.record_type(**entry['post']))
+        elif op == 'delete':
+            self._delete(entry['url'])
+        elif op == 'group':
+            self._add_group(entry['name'])
+
+    def _add(self, post):
+        self.posts.append(post)
+        self._add_group(post.group)
+
+    def _urls(self):
+        return (p.url for p in self.posts)
+
+    def _update(self, post, keep_group=False):
+        for i, url in enumerate(self._urls()):
+            if url == post.url:
+                if keep_group and not post.group:
+                    post.group = self.posts[i].group
+                self.posts[i] = post
+                break
+        else:
+            self.posts.append(post)
+        self._add_group(post.group)
+
+    def _update_many(self, posts, keep_group=False):
+        if len(posts) < 2:
+            for post in posts:
+                self._update(post, keep_group)
+            return
+        positions = {}
+        for i, url in enumerate(self._urls()):
+            positions.setdefault(url, i)
+        for post in posts:
+            i = positions.get(post.url)
+            if i is None:
+                positions[post.url] = len(self.posts)
+                self.posts.append(post)
+            else:
+                if keep_group and not post.group:
+                    post.group = self.posts[i].group
+                self.posts[i] = post
+            self._add_group(post.group)
+
+    def _known_urls(self) -> set:
+        # Built the first time something is saved, then kept up to date by the public methods
+        if self._url_set is None:
+            self._url_set = set(self._urls())
+        return self._url_set
+
+    def _delete(self, url):
+        for i in reversed([i for i, u in enumerate(self._urls()) if u == url]):
+            del self.posts[i]
+
+    def _add_group(self, name):
+        if name and name not in self.groups:
+            self.groups.append(name)
+
+    def _log(self, op, **fields):
+        self._index = None
+        self._seq += 1
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._journal.write(json.dumps(dict(seq=self._seq, op=op, **fields), separators=(',', ':')) + '\n')
+        self._pending += 1
+
+    def _maybe_compact(self):
+        # Compacting once the journal is as long as the vault keeps each change O(1) amortized
+        if self._pending > max(self.compact_after, len(self.posts)):
+            self.compact()
+
+    def _write_snapshot(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                "posts": [post_to_dict(p) for p in self.posts],
+                "groups": self.groups,
+                "journal_seq": self._seq,
+            }, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self):
+        self._index = None
+        tmp = self.filename + '.tmp'
+        self._write_snapshot(tmp)
+        os.replace(tmp, self.filename)
+        # The snapshot now covers every journal entry, so the journal can start over
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, 'w', encoding='utf-8')
+        self._pending = 0
+
+    def save(self):
+        # Writes whatever is in self.posts/self.groups as the new snapshot
+        self.compact()
+
+    def flush(self):
+        if self._journal is not None:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def save_post(self, post: PostData):
+        self.save_posts([post])
+
+    def save_posts(self, posts: List[PostData]):
+        # Saving a URL that is already in the vault updates its record instead of adding a
+        # second one; like SQLiteStorage, a post without a group keeps the one it had
+        known = self._known_urls()
+        new, existing = [], []
+        for post in posts:
+            (existing if post.url in known else new).append(post)
+            known.add(post.url)
+        for post in new:
+            self._add(post)
+            self._log('add', post=post_to_dict(post))
+        self._update_many(existing, keep_group=True)
+        for post in existing:
+            self._log('update', post=post_to_dict(post))
+        self._maybe_compact()
+
+    def update_post(self, post: PostData):
+        self.update_posts([post])
+
+    def update_posts(self, posts: List[PostData]):
+        self._update_many(posts)
+        if self._url_set is not None:
+            self._url_set.update(post.url for post in posts)
+        for post in posts:
+            self._log('update', post=post_to_dict(post))
+        self._maybe_compact()
+
+    def delete_post(self, url: str):
+        self._delete(url)
+        if self._url_set is not None:
+            self._url_set.discard(url)
+        self._log('delete', url=url)
+        self._maybe_compact()
+
+    def add_group(self, name: str):
+        if name and name not in self.groups:
+            self._add_group(name)
+            self._log('group', name=name)
+            self._maybe_compact()
+
+    def replace_all(self, posts: List[PostData], groups: List[str]):
+        self.posts = list(posts)
+        self.groups = list(groups)
+        self._url_set = None
+        self.compact()
+
+    def get_all_posts(self) -> List[PostData]:
+        return self.posts
+
+    def snapshot_posts(self):
+        # Posts are replaced, never changed in place, so a shallow copy is enough
+        return list(self.posts)
+
+    def _search(self, text, group, platform, sort_by):
+        if self._index is None:
+            self._index = SearchIndex(self.posts)
+        return self._index.search(text, group=group, platform=platform, sort_by=sort_by)
+
+    def query_posts(self, text='', group=None, platform=None, sort_by='title', limit=100, offset=0) -> List[PostData]:
+        return self._search(text, group, platform, sort_by)[offset:offset + limit]
+
+    def count_posts(self, text='', group=None, platform=None) -> int:
+        if not text and group is None and platform is None:
+            return len(self.posts)
+        return len(self._search(text, group, platform, 'title'))
+
+    def all_posts(self):
+        return self.posts
+
+    def all_groups(self):
+        return self.groups
+
+    def post_urls(self):
+        return self._urls()
+
+    def get_posts(self, urls) -> dict:
+        # Matches on URLs first so a vault only decodes the records asked for
+        wanted = set(urls)
+        return {url: self.posts[i] for i, url in enumerate(self._urls()) if url in wanted}
+
+class SQLiteStorage(StorageInterface):
+    COLUMNS = 'url, title, platform, description, tags, images, "group"'
+    SORT_COLUMNS = {'title': 'p.title', 'platform': 'p.platform', 'group': 'p."group"'}
+    # Re-fetching a URL refreshes its row; an empty group never overwrites one set earlier
+    UPSERT = (f'INSERT INTO posts ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?) '
+              'ON CONFLICT(url) DO UPDATE SET title = excluded.title, platform = excluded.platform, '
+              'description = excluded.description, tags = excluded.tags, images = excluded.images, '
+              '"group" = CASE WHEN excluded."group" = \'\' THEN posts."group" ELSE excluded."group" END')
+    # update_post() replaces the whole record, so it can also clear a group
+    REPLACE = (f'INSERT INTO posts ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?) '
+               'ON CONFLICT(url) DO UPDATE SET title = excluded.title, platform = excluded.platform, '
+               'description = excluded.description, tags = excluded.tags, images = excluded.images, '
+               '"group" = excluded."group"')
+
+    def __init__(self, db_path='data.db', background=False, record_type=PostData):
+        self.db_path = db_path
+        self.record_type = record_type
+        self.conn = self._connect(db_path)
+        self.groups: List[str] = []
+        self._init_db()
+        self.writer = SQLiteWriter(db_path) if background else None
+        if self.writer:
+            self.writer.start()
+
+    @staticmethod
+    def _connect(db_path):
+        conn = sqlite3.connect(db_path)
+        # WAL lets readers carry on while a batch commits; NORMAL sync is safe in WAL mode
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _init_db(self):
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS posts (
+                id INTEGER PRIMARY KEY,
+                title TEXT,
+                description TEXT,
+                tags TEXT,
+                images TEXT,
+                platform TEXT,
+                url TEXT
+            )''')
+            # Databases created before groups were supported lack the column
+            columns = {row[1] for row in self.conn.execute('PRAGMA table_info(posts)')}
+            if 'group' not in columns:
+                self.conn.execute('ALTER TABLE posts ADD COLUMN "group" TEXT NOT NULL DEFAULT \'\'')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS groups (name TEXT PRIMARY KEY, position INTEGER NOT NULL)')
+            # Upserts need url to be unique; older databases may hold duplicates, keep the newest
+            url_index = [row for row in self.conn.execute('PRAGMA index_list(posts)') if row[1] == 'idx_posts_url']
+            if not url_index or not url_index[0][2]:
+                self.conn.execute('DELETE FROM posts WHERE id NOT IN (SELECT MAX(id) FROM posts GROUP BY url)')
+                self.conn.execute('DROP INDEX IF EXISTS idx_posts_url')
+                self.conn.execute('CREATE UNIQUE INDEX idx_posts_url ON posts(url)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_posts_title ON posts(title COLLATE NOCASE)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_posts_platform ON posts(platform COLLATE NOCASE)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_posts_group ON posts("group" COLLATE NOCASE)')
+
+            # Contentless trigram FTS5 table kept in sync with triggers. It covers the fields
+            # SearchIndex does and matches the query as a substring, so both backends agree
+            fts = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'posts_fts'").fetchone()
+            if fts is not None and 'trigram' not in fts[0]:
+                # Older databases indexed title, description and tags by word
+                for trigger in ('insert', 'delete', 'update'):
+                    self.conn.execute(f'DROP TRIGGER IF EXISTS posts_fts_{trigger}')
+                self.conn.execute('DROP TABLE posts_fts')
+                fts = None
+            self.conn.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+                title, platform, tags, "group", content='', tokenize='trigram'
+            )''')
+            # Tags are indexed one per line rather than as their JSON text
+            tags = "(SELECT coalesce(group_concat(value, char(10)), '') FROM json_each({}.tags))".format
+            old, new = tags('old'), tags('new')
+            self.conn.execute(f'''CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+                INSERT INTO posts_fts(rowid, title, platform, tags, "group")
+                VALUES (new.id, new.title, new.platform, {new}, new."group");
+            END''')
+            self.conn.execute(f'''CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+                INSERT INTO posts_fts(posts_fts, rowid, title, platform, tags, "group")
+                VALUES ('delete', old.id, old.title, old.platform, {old}, old."group");
+            END''')
+            self.conn.execute(f'''CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE ON posts BEGIN
+                INSERT INTO posts_fts(posts_fts, rowid, title, platform, tags, "group")
+                VALUES ('delete', old.id, old.title, old.platform, {old}, old."group");
+                INSERT INTO posts_fts(rowid, title, platform, tags, "group")
+                VALUES (new.id, new.title, new.platform, {new}, new."group");
+            END''')
+            if fts is None:
+                self.conn.execute(f'INSERT INTO posts_fts(rowid, title, platform, tags, "group") '
+                                  f'SELECT id, title, platform, {tags("posts")}, "group" FROM posts')
+
+    @staticmethod
+    def _row(post: PostData):
+        return (post.url, post.title, post.platform, post.description,
+                json.dumps(post.tags), json.dumps(post.images), post.group)
+
+    def _post(self, row):
+        url, title, platform, description, tags, images, group = row
+        return self.record_type(url=url, title=title or '', platform=platform or '', description=description or '',
+                                tags=json.loads(tags or '[]'), images=json.loads(images or '[]'), group=group or '')
+
+    def save_post(self, post: PostData):
+        self.save_posts([post])
+
+    def save_posts(self, posts: List[PostData]):
+        self._add_groups(posts)
+        if self.writer:
+            self.writer.submit(posts)
+        else:
+            self.write_posts(self.conn, posts)
+
+    def update_post(self, post: PostData):
+        self.update_posts([post])
+
+    def update_posts(self, posts: List[PostData]):
+        # Written here rather than by the writer, after whatever it still has queued
+        self.flush()
+        self._add_groups(posts)
+        self.write_posts(self.conn, posts, keep_group=False)
+
+    def _add_groups(self, posts):
+        for post in posts:
+            if post.group and post.group not in self.groups:
+                self.groups.append(post.group)
+
+    def delete_post(self, url: str):
+        self.flush()
+        with self.conn:
+            self.conn.execute('DELETE FROM posts WHERE url = ?', (url,))
+
+    def add_group(self, name: str):
+        if name and name not in self.groups:
+            self.groups.append(name)
+            with self.conn:
+                self.conn.execute('INSERT OR IGNORE INTO groups (name, position) '
+                                  'VALUES (?, (SELECT COUNT(*) FROM groups))', (name,))
+
+    def replace_all(self, posts: List[PostData], groups: List[str]):
+        # One transaction: readers see either the old vault or the new one, never a mix
+        self.flush()
+        posts = list(posts)
+        self.groups = list(dict.fromkeys(list(groups) + [p.group for p in posts if p.group]))
+        rows = [self._row(p) for p in posts]
+        with self.conn:
+            self.conn.execute('DELETE FROM posts')
+            self.conn.executemany(self.UPSERT, rows)
+            self.conn.execute('DELETE FROM groups')
+            self.conn.executemany('INSERT INTO groups (name, position) VALUES (?, ?)',
+                                  [(name, i) for i, name in enumerate(self.groups)])
+
+    @classmethod
+    def write_posts(cls, conn, posts: List[PostData], keep_group=True):
+        # The whole batch is one transaction
+        with conn:
+            conn.executemany(cls.UPSERT if keep_group else cls.REPLACE, [cls._row(p) for p in posts])
+            conn.executemany('INSERT OR IGNORE INTO groups (name, position) '
+                             'VALUES (?, (SELECT COUNT(*) FROM groups))',
+                             [(g,) for g in dict.fromkeys(p.group for p in posts if p.group)])
+
+    def flush(self):
+        if self.writer:
+            self.writer.flush()
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        self.conn.close()
+
+    def iter_posts(self, batch_size=1000):
+        self.flush()
+        cursor = self.conn.execute(f'SELECT {self.COLUMNS} FROM posts ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield self._post(row)
+
+    def get_all_posts(self) -> List[PostData]:
+        return list(self.iter_posts())
+
+    def snapshot_posts(self):
+        # A read transaction on a connection of its own, started here; in WAL mode it keeps
+        # seeing the vault as it is now while this storage goes on writing
+        self.flush()
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute('BEGIN')
+        conn.execute('SELECT COUNT(*) FROM posts').fetchone()
+
+        def read():
+            try:
+                for row in conn.execute(f'SELECT {self.COLUMNS} FROM posts ORDER BY id'):
+                    yield self._post(row)
+            finally:
+                conn.close()
+        return read()
+
+    def post_urls(self):
+        self.flush()
+        return (row[0] for row in self.conn.execute('SELECT url FROM posts ORDER BY id'))
+
+    def get_posts(self, urls) -> dict:
+        self.flush()
+        urls = list(urls)
+        found = {}
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            marks = ', '.join('?' * len(chunk))
+            for row in self.conn.execute(f'SELECT {self.COLUMNS} FROM posts WHERE url IN ({marks})', chunk):
+                found[row[0]] = self._post(row)
+        return found
+
+    def _where(self, text, group, platform):
+        joins, where, params = '', [], []
+        if len(text) >= 3:
+            # The whole query as one phrase of trigrams, i.e. a case-insensitive substring
+            joins = ' JOIN posts_fts ON posts_fts.rowid = p.id'
+            where.append('posts_fts MATCH ?')
+            params.append('"' + text.replace('"', '""') + '"')
+        elif text:
+            # Too short for trigrams; a scan is fine since nearly everything matches anyway
+            where.append('(instr(lower(p.title), ?) OR instr(lower(p.platform), ?) OR instr(lower(p."group"), ?) '
+                         'OR EXISTS (SELECT 1 FROM json_each(p.tags) WHERE instr(lower(value), ?)))')
+            params.extend([text.lower()] * 4)
+        if group is not None:
+            where.append('p."group" = ?')
+            params.append(group)
+        if platform is not None:
+            where.append('p.platform = ? COLLATE NOCASE')
+            params.append(platform)
+        return joins + (' WHERE ' + ' AND '.join(where) if where else ''), params
+
+    def query_posts(self, text='', group=None, platform=None, sort_by='title', limit=100, offset=0) -> List[PostData]:
+        self.flush()
+        clause, params = self._where(text, group, platform)
+        order = self.SORT_COLUMNS.get(sort_by, 'p.title')
+        columns = ', '.join('p.' + c for c in self.COLUMNS.split(', '))
+        cursor = self.conn.execute(f'SELECT {columns} FROM posts p{clause} '
+                                   f'ORDER BY {order} COLLATE NOCASE, p.id LIMIT ? OFFSET ?',
+                                   params + [limit, offset])
+        return [self._post(row) for row in cursor]
+
+    def search_posts(self, text='', group=None, platform=None, sort_by='title'):
+        self.flush()
+        clause, params = self._where(text, group, platform)
+        order = self.SORT_COLUMNS.get(sort_by, 'p.title')
+        cursor = self.conn.execute(f'SELECT p.id FROM posts p{clause} ORDER BY {order} COLLATE NOCASE, p.id', params)
+        return SQLiteResults(self, array('q', (row_id for row_id, in cursor)))
+
+    def _read_rows(self, ids):
+        marks = ', '.join('?' * len(ids))
+        rows = {row[0]: row[1:] for row in self.conn.execute(
+            f'SELECT id, {self.COLUMNS} FROM posts WHERE id IN ({marks})', list(ids))}
+        # A row deleted since the search reads as an empty post until the view is refreshed
+        return [self._post(rows.get(row_id, ('',) + (None,) * 6)) for row_id in ids]
+
+    def count_posts(self, text='', group=None, platform=None) -> int:
+        self.flush()
+        clause, params = self._where(text, group, platform)
+        return self.conn.execute(f'SELECT COUNT(*) FROM posts p{clause}', params).fetchone()[0]
+
+    def all_posts(self):
+        # A fresh list each time. PostApp doesn't ask for it, since search_posts() filters in SQL
+        return self.get_all_posts()
+
+    def all_groups(self):
+        self.groups = [name for name, in self.conn.execute('SELECT name FROM groups ORDER BY position')]
+        return self.groups
+
+class SQLiteResults(Sequence):
+    # Search results as row ids in order; rows are read a page at a time as they are looked at
+    PAGE = 256
+
+    def __init__(self, storage: SQLiteStorage, ids: array):
+        self._storage = storage
+        self._ids = ids
+        self._pages = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self._ids)))]
+        if i < 0:
+            i += len(self._ids)
+        if not 0 <= i < len(self._ids):
+            raise IndexError(i)
+        page, offset = divmod(i, self.PAGE)
+        if page not in self._pages:
+            if len(self._pages) >= 64:
+                self._pages.clear()
+            start = page * self.PAGE
+            self._pages[page] = self._storage._read_rows(self._ids[start:start + self.PAGE])
+        return self._pages[page][offset]
+
+class SQLiteWriter(threading.Thread):
+    # Owns a second connection and commits whatever has queued up meanwhile as one transaction,
+    # so callers of save_posts() never wait on the disk
+    def __init__(self, db_path, batch_size=1000, max_delay=0.05):
+        super().__init__(name='sqlite-writer', daemon=True)
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.error: Optional[Exception] = None
+        self._queue = queue.Queue()
+
+    def submit(self, posts: List[PostData]):
+        self._queue.put(list(posts))
+
+    def flush(self):
+        self._queue.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def close(self):
+        self._queue.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        conn = SQLiteStorage._connect(self.db_path)
+        running = True
+        while running:
+            items = [self._queue.get()]
+            pending = len(items[0]) if items[0] else 0
+            deadline = time.monotonic() + self.max_delay
+            while items[-1] is not None and pending < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                items.append(item)
+                pending += len(item) if item else 0
+            running = items[-1] is not None
+            posts = [post for item in items if item for post in item]
+            try:
+                if posts:
+                    SQLiteStorage.write_posts(conn, posts)
+            except Exception as e:
+                self.error = e
+            for _ in items:
+                self._queue.task_done()
+        conn.close()
+
+class VaultSnapshot:
+    # Binary vault snapshot, read through mmap so opening it costs nothing per record.
+    #   header   magic, version, record count, section offsets, journal_seq
+    #   records  u32 length | u32 url length | url | u8 flags | body (zlib'd if flags & 1)
+    #            body = title, description, platform id, group id, tag ids, images
+    #   strings  every platform, group and tag value once; records refer to them by id
+    #   groups   group list as string ids
+    #   index    u64 offset of each record
+    #   orders   record numbers presorted by title, platform and group
+    MAGIC = b'LVAULT\x00\x01'
+    VERSION = 1
+    HEADER = struct.Struct('<8sIIQQQQQ')
+    U16 = struct.Struct('<H')
+    U32 = struct.Struct('<I')
+    IDS = struct.Struct('<II')
+    ORDER_KEYS = ('title', 'platform', 'group')
+
+    def __init__(self, path, record_type=PostData):
+        self.record_type = record_type
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, strings_off, groups_off, index_off, orders_off, journal_seq = \
+            self.HEADER.unpack_from(self._mm, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} is not a vault snapshot")
+        self.count = count
+        self.journal_seq = journal_seq
+        self.strings = []
+        (n,), pos = self.U32.unpack_from(self._mm, strings_off), strings_off + 4
+        for _ in range(n):
+            value, pos = self._read_str(self._mm, pos)
+            self.strings.append(sys.intern(value))
+        (n,) = self.U32.unpack_from(self._mm, groups_off)
+        self.groups = [self.strings[i] for i in self._array('I', groups_off + 4, n)]
+        self._offsets = self._array('Q', index_off, count)
+        self._orders = {key: self._array('I', orders_off + 4 * count * i, count)
+                        for i, key in enumerate(self.ORDER_KEYS)}
+
+    def _array(self, typecode, offset, count):
+        values = array(typecode)
+        values.frombytes(self._mm[offset:offset + values.itemsize * count])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return values
+
+    @classmethod
+    def _read_str(cls, buf, pos):
+        (n,) = cls.U32.unpack_from(buf, pos)
+        pos += 4
+        return buf[pos:pos + n].decode('utf-8'), pos + n
+
+    @classmethod
+    def _pack_str(cls, value):
+        data = value.encode('utf-8')
+        return cls.U32.pack(len(data)) + data
+
+    def __len__(self):
+        return self.count
+
+    def url(self, i) -> str:
+        value, _ = self._read_str(self._mm, self._offsets[i] + 4)
+        return value
+
+    def post(self, i):
+        mm = self._mm
+        start = self._offsets[i]
+        (length,) = self.U32.unpack_from(mm, start)
+        url, pos = self._read_str(mm, start + 4)
+        flags = mm[pos]
+        body = mm[pos + 1:start + 4 + length]
+        if flags & 1:
+            body = zlib.decompress(body)
+        title, pos = self._read_str(body, 0)
+        description, pos = self._read_str(body, pos)
+        platform, group = self.IDS.unpack_from(body, pos)
+        (n,) = self.U16.unpack_from(body, pos + 8)
+        pos += 10
+        tags = [self.strings[t] for t in struct.unpack_from(f'<{n}I', body, pos)]
+        pos += 4 * n
+        (n,) = self.U16.unpack_from(body, pos)
+        pos += 2
+        images = []
+        for _ in range(n):
+            image, pos = self._read_str(body, pos)
+            images.append(image)
+        return self.record_type(url=url, title=title, platform=self.strings[platform], description=description,
+                                tags=tags, images=images, group=self.strings[group])
+
+    def order(self, key) -> array:
+        return self._orders[key]
+
+    def close(self):
+        self._mm.close()
+
+    @classmethod
+    def write(cls, path, posts, groups, journal_seq=0, compress=True):
+        posts = list(posts)
+        strings = {}
+        intern = lambda value: strings.setdefault(value, len(strings))
+        offsets = array('Q')
+        with open(path, 'wb') as f:
+            f.write(b'\x00' * cls.HEADER.size)
+            for post in posts:
+                offsets.append(f.tell())
+                tag_ids = [intern(t) for t in post.tags]
+                body = b''.join([
+                    cls._pack_str(post.title),
+                    cls._pack_str(post.description),
+                    cls.IDS.pack(intern(post.platform), intern(post.group)),
+                    cls.U16.pack(len(tag_ids)),
+                    struct.pack(f'<{len(tag_ids)}I', *tag_ids),
+                    cls.U16.pack(len(post.images)),
+                    *(cls._pack_str(image) for image in post.images),
+                ])
+                flags = 0
+                # Short records don't shrink under zlib, long descriptions do
+                if compress and len(body) > 256:
+                    packed = zlib.compress(body, 6)
+                    if len(packed) < len(body):
+                        body, flags = packed, 1
+                record = cls._pack_str(post.url) + bytes([flags]) + body
+                f.write(cls.U32.pack(len(record)) + record)
+
+            group_ids = [intern(g) for g in groups]
+            strings_off = f.tell()
+            f.write(cls.U32.pack(len(strings)))
+            f.write(b''.join(cls._pack_str(value) for value in strings))
+            groups_off = f.tell()
+            f.write(cls.U32.pack(len(group_ids)) + struct.pack(f'<{len(group_ids)}I', *group_ids))
+
+            def write_array(values):
+                if sys.byteorder != 'little':
+                    values.byteswap()
+                f.write(values.tobytes())
+
+            index_off = f.tell()
+            write_array(offsets)
+            orders_off = f.tell()
+            for key in cls.ORDER_KEYS:
+                sort_value = SearchIndex.SORT_KEYS[key]
+                values = [sort_value(p) for p in posts]
+                write_array(array('I', sorted(range(len(posts)), key=values.__getitem__)))
+
+            f.seek(0)
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(posts), strings_off, groups_off,
+                                    index_off, orders_off, journal_seq))
+            f.flush()
+            os.fsync(f.fileno())
+
+class LazyPostList(MutableSequence):
+    # List of posts backed by a VaultSnapshot. Entries stay record numbers until first read,
+    # then the decoded PostData is kept so every read returns the same object.
+    def __init__(self, snapshot: VaultSnapshot):
+        self._snapshot = snapshot
+        self._items = list(range(len(snapshot)))
+        self.changed = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def _decode(self, i):
+        item = self._items[i]
+        if type(item) is int:
+            item = self._items[i] = self._snapshot.post(item)
+        return item
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._decode(j) for j in range(*i.indices(len(self._items)))]
+        return self._decode(i)
+
+    def __iter__(self):
+        for i in range(len(self._items)):
+            yield self._decode(i)
+
+    def __setitem__(self, i, value):
+        self.changed = True
+        self._items[i] = list(value) if isinstance(i, slice) else value
+
+    def __delitem__(self, i):
+        self.changed = True
+        del self._items[i]
+
+    def insert(self, i, value):
+        self.changed = True
+        self._items.insert(i, value)
+
+    def urls(self):
+        for item in self._items:
+            yield self._snapshot.url(item) if type(item) is int else item.url
+
+    def stream(self):
+        # Reads every post once without keeping the ones that weren't decoded yet
+        for item in self._items:
+            yield self._snapshot.post(item) if type(item) is int else item
+
+    def materialize(self):
+        # Decodes whatever is left so the snapshot can be closed
+        for i in range(len(self._items)):
+            self._decode(i)
+        self._snapshot = None
+
+class OrderedView(Sequence):
+    # Read-only view of posts in a presorted order, decoded only as rows are looked at
+    def __init__(self, posts: LazyPostList, order: array):
+        self._posts = posts
+        self._order = order
+
+    def __len__(self):
+        return len(self._order)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._posts[j] for j in self._order[i]]
+        return self._posts[self._order[i]]
+
+class VaultStorage(JSONStorage):
+    # JSONStorage with a binary snapshot (posts.vault) instead of posts.json. Opening the
+    # vault only maps the file; posts are decoded the first time something reads them.
+    def __init__(self, filename='posts.vault', compact_after=1000, record_type=PostData):
+        self._snapshot: Optional[VaultSnapshot] = None
+        super().__init__(filename, compact_after, record_type)
+
+    def load(self):
+        self._index = None
+        self._url_set = None
+        self._close_snapshot()
+        try:
+            self._snapshot = VaultSnapshot(self.filename, self.record_type)
+        except FileNotFoundError:
+            self.posts, self.groups, self._seq = [], [], 0
+        else:
+            self.posts = LazyPostList(self._snapshot)
+            self.groups = list(self._snapshot.groups)
+            self._seq = self._snapshot.journal_seq
+        self._replay()
+
+    def _close_snapshot(self):
+        if self._snapshot is not None:
+            if isinstance(self.posts, LazyPostList):
+                self.posts.materialize()
+            self._snapshot.close()
+            self._snapshot = None
+
+    def _urls(self):
+        if isinstance(self.posts, LazyPostList):
+            return self.posts.urls()
+        return super()._urls()
+
+    def iter_posts(self, batch_size=1000):
+        if isinstance(self.posts, LazyPostList):
+            return self.posts.stream()
+        return super().iter_posts(batch_size)
+
+    def _write_snapshot(self, path):
+        VaultSnapshot.write(path, self.posts, self.groups, self._seq)
+
+    def compact(self):
+        # The old file has to be unmapped before it can be replaced (Windows refuses otherwise)
+        self._close_snapshot()
+        super().compact()
+
+    def ordered_posts(self, sort_by='title'):
+        if self._snapshot is None or self.posts.changed or sort_by not in VaultSnapshot.ORDER_KEYS:
+            return None
+        return OrderedView(self.posts, self._snapshot.order(sort_by))
+
+    @classmethod
+    def convert(cls, json_path='posts.json', vault_path='posts.vault', force=False):
+        # An existing vault (and its journal) is only replaced when asked to
+        if not force and (os.path.exists(vault_path) or os.path.exists(vault_path + '.journal')):
+            raise FileExistsError(f"{vault_path} already exists")
+        source = JSONStorage(json_path)
+        tmp = vault_path + '.tmp'
+        VaultSnapshot.write(tmp, source.posts, source.groups)
+        os.replace(tmp, vault_path)
+        if os.path.exists(vault_path + '.journal'):
+            os.remove(vault_path + '.journal')
+        return len(source.posts)
+
+class SearchIndex:
+    # In-memory index behind the GUI filter, updated incrementally on add/remove:
+    # - word tokens -> posts, with a trigram index over the (much smaller) token vocabulary
+    #   to find the tokens a query can be part of
+    # - per-group and per-platform postings
+    # - one presorted ordering per sort key, so results come out sorted without re-sorting
+    SORT_KEYS = {
+        'title': lambda p: p.title.lower(),
+        'platform': lambda p: sys.intern(p.platform.lower()),
+        'group': lambda p: sys.intern(p.group.lower()),
+    }
+    TOKEN = re.compile(r'\w+')
+
+    def __init__(self, posts=()):
+        self.rebuild(posts)
+
+    def rebuild(self, posts):
+        self._docs: List[Optional[PostData]] = []
+        self._text: List[str] = []
+        self._seq = {}  # id(post) -> doc number
+        self._postings = {}  # token -> array of doc numbers
+        self._token_grams = defaultdict(list)  # trigram -> tokens containing it
+        self._groups = defaultdict(set)
+        self._platforms = defaultdict(set)
+        self._values = {key: [] for key in self.SORT_KEYS}  # sort value by doc number
+        self._facets = []  # (group, platform) by doc number, as indexed
+        self._bases = {}
+        self._last = None
+        self._dead = 0
+        for post in posts:
+            self._index(post)
+        # Each ordering is kept as parallel lists: sort value, doc number, post and search text
+        self._orders = {}
+        for key in self.SORT_KEYS:
+            values = self._values[key]
+            alive = list(range(len(self._docs)))
+            alive.sort(key=values.__getitem__)
+            self._orders[key] = (
+                [values[doc] for doc in alive],
+                alive,
+                [self._docs[doc] for doc in alive],
+                [self._text[doc] for doc in alive],
+            )
+
+    def __len__(self):
+        return len(self._seq)
+
+    def add(self, post: PostData):
+        doc = self._index(post)
+        for key in self.SORT_KEYS:
+            values, docs, posts, texts = self._orders[key]
+            value = self._values[key][doc]
+            # The new doc number is the largest, so it goes after equal values like a stable sort would
+            i = bisect_right(values, value)
+            values.insert(i, value)
+            docs.insert(i, doc)
+            posts.insert(i, post)
+            texts.insert(i, self._text[doc])
+
+    def remove(self, post: PostData):
+        doc = self._seq.pop(id(post), None)
+        if doc is None:
+            return
+        self._bases.clear()
+        self._last = None
+        for key in self.SORT_KEYS:
+            values, docs, posts, texts = self._orders[key]
+            value = self._values[key][doc]
+            i = bisect_left(docs, doc, bisect_left(values, value), bisect_right(values, value))
+            del values[i], docs[i], posts[i], texts[i]
+        group, platform = self._facets[doc]
+        self._groups[group].discard(doc)
+        self._platforms[platform].discard(doc)
+        # Token postings are cleaned lazily: a dead doc has empty text and never verifies
+        self._docs[doc] = None
+        self._text[doc] = ''
+        self._dead += 1
+        if self._dead > 1024 and self._dead * 4 > len(self._docs):
+            self.rebuild([p for p in self._docs if p is not None])
+
+    def update(self, post: PostData):
+        self.remove(post)
+        self.add(post)
+
+    def _index(self, post):
+        doc = len(self._docs)
+        self._docs.append(post)
+        self._seq[id(post)] = doc
+        # Fields are joined with a separator no query contains, so matches can't span two fields
+        text = '\x00'.join([post.title, post.platform, *post.tags, post.group]).lower()
+        self._text.append(text)
+        for token in set(self.TOKEN.findall(text)):
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = array('I')
+                for gram in {token[i:i + 3] for i in range(len(token) - 2)}:
+                    self._token_grams[gram].append(token)
+            posting.append(doc)
+        facets = (post.group, post.platform.lower())
+        self._facets.append(facets)
+        self._groups[facets[0]].add(doc)
+        self._platforms[facets[1]].add(doc)
+        for key, sort_value in self.SORT_KEYS.items():
+            self._values[key].append(sort_value(post))
+        self._bases.clear()
+        self._last = None
+        return doc
+
+    def _candidates(self, query):
+        # Every match contains the query's longest word inside one of its tokens. Returns None
+        # when the index can't narrow things down enough to beat a straight scan.
+        words = self.TOKEN.findall(query)
+        if not words:
+            return None
+        word = max(words, key=len)
+        if len(word) < 3:
+            return None
+        grams = [self._token_grams.get(word[i:i + 3], ()) for i in range(len(word) - 2)]
+        tokens = [token for token in min(grams, key=len) if word in token]
+        budget = len(self._docs) // 32
+        candidates = set()
+        for token in tokens:
+            candidates.update(self._postings[token])
+            if len(candidates) > budget:
+                return None
+        return candidates
+
+    def _base(self, group, platform, restrict, sort_by):
+        # The presorted ordering narrowed to a group/platform, cached until the next change
+        _, docs, posts, texts = self._orders[sort_by]
+        if restrict is None:
+            return posts, texts
+        key = (group, platform, sort_by)
+        if key not in self._bases:
+            if len(self._bases) >= 16:
+                self._bases.clear()
+            mask = list(map(restrict.__contains__, docs))
+            self._bases[key] = (list(compress(posts, mask)), list(compress(texts, mask)))
+        return self._bases[key]
+
+    def search(self, text='', group=None, platform=None, sort_by='title') -> List[PostData]:
+        query = text.lower()
+        sort_by = sort_by if sort_by in self.SORT_KEYS else 'title'
+        restrict = None
+        if group is not None:
+            restrict = self._groups.get(group, set())
+        if platform is not None:
+            on_platform = self._platforms.get(platform.lower(), set())
+            restrict = on_platform if restrict is None else restrict & on_platform
+
+        if not query:
+            return list(self._base(group, platform, restrict, sort_by)[0])
+
+        candidates = self._candidates(query)
+        if candidates is not None:
+            if restrict is not None:
+                candidates &= restrict
+            matches = sorted(doc for doc in candidates if query in self._text[doc])
+            values = self._values[sort_by]
+            return [self._docs[doc] for doc in sorted(matches, key=values.__getitem__)]
+
+        # Unselective query: scan in sorted order with the per-post work done in C. When the user
+        # keeps typing, the new query can only match a subset of the previous one's results.
+        scope = (group, platform, sort_by)
+        if self._last is not None and self._last[0] == scope and self._last[1] in query:
+            posts, texts = self._last[2], self._last[3]
+        else:
+            posts, texts = self._base(group, platform, restrict, sort_by)
+        mask = list(map(contains, texts, repeat(query)))
+        posts, texts = list(compress(posts, mask)), list(compress(texts, mask))
+        self._last = (scope, query, posts, texts)
+        return list(posts)
+
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+FETCH_TIMEOUT = 15
+CACHE_DIR = 'cache'
+
+_session: Optional['requests.Session'] = None
+_session_lock = threading.Lock()
+
+def http_session() -> 'requests.Session':
+    # One keep-alive session shared by every fetcher; the pool is sized for the bulk workers
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(HEADERS)
+            _session = session
+    return _session
+
+class RetryableFetchError(Exception):
+    # Throttling (429), server errors and dropped connections: the URL is worth trying again later
+    def __init__(self, message, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def check_retryable(response):
+    if response.status_code == 429 or response.status_code >= 500:
+        raise RetryableFetchError(f"HTTP {response.status_code}", parse_retry_after(response.headers.get('Retry-After')))
+
+class ResponseCache:
+    # Response bodies on disk keyed by URL, stored with the validators needed to revalidate them.
+    # The total size is capped and the least recently used entries are evicted first.
+    def __init__(self, directory=os.path.join(CACHE_DIR, 'http'), max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> bytes on disk, least recently used first
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return key, base + '.body', base + '.json'
+
+    def _scan(self):
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json'):
+                    key = name[:-5]
+                    body_path = os.path.join(root, key + '.body')
+                    meta_path = os.path.join(root, name)
+                    try:
+                        mtime = os.path.getmtime(meta_path)
+                        size = os.path.getsize(body_path)
+                    except OSError:
+                        continue
+                    found.append((mtime, key, size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.size += size
+        self._evict()
+
+    def get(self, url) -> Tuple[Optional[dict], Optional[bytes]]:
+        key, body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return meta, body
+
+    def put(self, url, body: bytes, meta: dict):
+        key, body_path, meta_path = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        suffix = f'.{threading.get_ident()}.tmp'
+        with open(body_path + suffix, 'wb') as f:
+            f.write(body)
+        os.replace(body_path + suffix, body_path)
+        self.touch(url, meta)
+        with self._lock:
+            self.size += len(body) - self._entries.pop(key, 0)
+            self._entries[key] = len(body)
+            self._evict()
+
+    def touch(self, url, meta: dict):
+        _, _, meta_path = self._paths(url)
+        meta = dict(meta, checked=time.time())
+        suffix = f'.{threading.get_ident()}.tmp'
+        with open(meta_path + suffix, 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + suffix, meta_path)
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.size -= size
+            base = os.path.join(self.directory, key[:2], key)
+            for path in (base + '.body', base + '.json'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+class HTTPResponse:
+    # The subset of requests.Response the fetchers use. After a 304 the body is replayed from the
+    # response cache; otherwise it is streamed from the network and stored once read.
+    def __init__(self, url, status_code, headers, response=None, body=None, on_read=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.from_cache = body is not None
+        self._response = response
+        self._body = body
+        self._on_read = on_read
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def encoding(self) -> Optional[str]:
+        from requests.utils import get_encoding_from_headers
+        return get_encoding_from_headers(self.headers)
+
+    def raise_for_status(self):
+        if not self.ok:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} error for url: {self.url}")
+
+    def iter_content(self, chunk_size):
+        if self._body is not None:
+            for start in range(0, len(self._body), chunk_size):
+                yield self._body[start:start + chunk_size]
+            return
+        chunks = []
+        complete = False
+        try:
+            for chunk in self._response.iter_content(chunk_size):
+                chunks.append(chunk)
+                yield chunk
+            complete = True
+        finally:
+            # Runs when the caller stops early too, so a head-only read still caches its prefix
+            body = b''.join(chunks)
+            if complete:
+                self._body = body
+            if self._on_read is not None:
+                self._on_read(body, complete)
+                self._on_read = None
+
+    @property
+    def content(self) -> bytes:
+        if self._body is None:
+            for _ in self.iter_content(64 * 1024):
+                pass
+        return self._body
+
+    def close(self):
+        if self._response is not None:
+            self._response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class HTTPClient:
+    # Single entry point for page and image downloads: the pooled session from http_session()
+    # plus the on-disk ResponseCache. Cached URLs are always revalidated with If-None-Match /
+    # If-Modified-Since, so an unchanged page costs a 304 instead of a full download.
+    def __init__(self, cache: Optional[ResponseCache] = None):
+        self.cache = cache
+
+    def get(self, url, timeout=FETCH_TIMEOUT, partial_ok=False, validators: Optional[dict] = None) -> HTTPResponse:
+        # partial_ok: the caller reads only a prefix (fetch_head), so a cached prefix will do.
+        # validators: the caller keeps its own copy (ImageLoader's thumbnails) and gets bare 304s back.
+        meta, body = (None, None)
+        if validators is None and self.cache is not None:
+            meta, body = self.cache.get(url)
+            if meta and not (meta.get('complete') or partial_ok):
+                meta, body = None, None
+        check = validators if validators is not None else meta or {}
+        headers = {}
+        if check.get('etag'):
+            headers['If-None-Match'] = check['etag']
+        if check.get('last_modified'):
+            headers['If-Modified-Since'] = check['last_modified']
+        response = http_session().get(url, headers=headers, timeout=timeout, stream=True)
+        METRICS.count('http', str(response.status_code))
+        if response.status_code == 304 and meta is not None:
+            response.close()
+            METRICS.count('http', 'cache_hit')
+            self.cache.touch(url, meta)
+            from requests.structures import CaseInsensitiveDict
+            return HTTPResponse(url, 200, CaseInsensitiveDict(meta['headers']), body=body)
+        on_read = None
+        if validators is None and self.cache is not None and self._cacheable(response):
+            on_read = lambda data, complete: self._store(url, response, data, complete)
+        return HTTPResponse(url, response.status_code, response.headers, response=response, on_read=on_read)
+
+    @staticmethod
+    def _cacheable(response) -> bool:
+        # Nothing to revalidate against without a validator, so such responses aren't kept
+        if response.status_code != 200 or 'no-store' in response.headers.get('Cache-Control', ''):
+            return False
+        return bool(response.headers.get('ETag') or response.headers.get('Last-Modified'))
+
+    def _store(self, url, response, body, complete):
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'headers': {'Content-Type': response.headers.get('Content-Type', '')},
+            'complete': complete,
+        }
+        try:
+            self.cache.put(url, body, meta)
+        except OSError as e:
+            print(f"Response cache write failed for {url}: {e}")
+
+_client: Optional[HTTPClient] = None
+
+def http_client() -> HTTPClient:
+    global _client
+    with _session_lock:
+        if _client is None:
+            _client = HTTPClient(ResponseCache())
+    return _client
+
+YOUTUBE_OPTS = {'quiet': True, 'no_warnings': True, 'skip_download': True}
+YOUTUBE_INFO_KEYS = ('title', 'description', 'tags', 'thumbnail')
+YOUTUBE_COLLECTION_PATHS = ('/playlist', '/channel/', '/c/', '/user/', '/@')
+
+def _youtube_info(ydl, url: str) -> dict:
+    # Only the fields a post needs, so results stay small when they cross a process boundary
+    info = ydl.extract_info(url, download=False)
+    return {key: info.get(key) for key in YOUTUBE_INFO_KEYS}
+
+_process_ydl = None
+
+def _init_youtube_process():
+    global _process_ydl
+    import yt_dlp
+    _process_ydl = yt_dlp.YoutubeDL(YOUTUBE_OPTS)
+
+def _extract_in_process(url: str) -> dict:
+    try:
+        return _youtube_info(_process_ydl, url)
+    except Exception as e:
+        # yt_dlp's errors don't survive pickling back to the parent, so send the message instead
+        raise RuntimeError(str(e)) from None
+
+def is_youtube_collection(url: str) -> bool:
+    parsed = urlparse(url)
+    host = url_host(url)
+    return (host.endswith('youtube.com') and parsed.path.startswith(YOUTUBE_COLLECTION_PATHS)
+            and 'v=' not in parsed.query)
+
+class YouTubeExtractorPool:
+    # Long-lived YoutubeDL instances handed out one per concurrent call, so extractor setup is
+    # paid once per instance instead of once per video. With processes=True each worker process
+    # owns one instance instead, keeping yt_dlp's CPU work off the app's GIL.
+    def __init__(self, size=4, processes=False):
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._processes: Optional[ProcessPoolExecutor] = None
+        if processes:
+            self._processes = ProcessPoolExecutor(self.size, mp_context=multiprocessing.get_context('spawn'),
+                                                  initializer=_init_youtube_process)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                import yt_dlp
+                self._created += 1
+                return yt_dlp.YoutubeDL(YOUTUBE_OPTS)
+        return self._idle.get()
+
+    def extract(self, url: str) -> dict:
+        if self._processes is not None:
+            with METRICS.timed('fetch', 'yt_dlp'):
+                return self._processes.submit(_extract_in_process, url).result()
+        ydl = self._acquire()
+        try:
+            with METRICS.timed('fetch', 'yt_dlp'):
+                return _youtube_info(ydl, url)
+        finally:
+            self._idle.put(ydl)
+
+    def expand(self, url: str) -> List[str]:
+        # Flat extraction lists a playlist's or channel's entries without resolving each video;
+        # channel pages come back as nested tabs (Videos, Shorts, ...) which are expanded in turn
+        import yt_dlp
+        with yt_dlp.YoutubeDL({**YOUTUBE_OPTS, 'extract_flat': 'in_playlist'}) as ydl:
+            info = ydl.extract_info(url, download=False)
+        if info.get('_type') != 'playlist':
+            return [url]
+        urls = []
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue
+            entry_url = entry.get('url') or entry.get('webpage_url') or ''
+            if entry.get('_type') == 'playlist' or entry.get('ie_key') == 'YoutubeTab':
+                urls.extend(self.expand(entry_url))
+            elif entry_url.startswith('http'):
+                urls.append(entry_url)
+            elif entry.get('id'):
+                urls.append(f"https://www.youtube.com/watch?v={entry['id']}")
+        return urls
+
+    def shutdown(self):
+        if self._processes is not None:
+            self._processes.shutdown(cancel_futures=True)
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_youtube_pool: Optional[YouTubeExtractorPool] = None
+_youtube_pool_lock = threading.Lock()
+
+def youtube_pool() -> YouTubeExtractorPool:
+    global _youtube_pool
+    with _youtube_pool_lock:
+        if _youtube_pool is None:
+            _youtube_pool = YouTubeExtractorPool()
+    return _youtube_pool
+
+def configure_youtube_pool(size=4, processes=False) -> YouTubeExtractorPool:
+    global _youtube_pool
+    with _youtube_pool_lock:
+        if _youtube_pool is not None:
+            _youtube_pool.shutdown()
+        _youtube_pool = YouTubeExtractorPool(size, processes)
+    return _youtube_pool
+
+def expand_urls(urls: List[str]) -> List[str]:
+    # Replaces YouTube playlist/channel links with their videos, keeping order and dropping repeats
+    seen = set()
+    expanded = []
+    for url in urls:
+        for video_url in youtube_pool().expand(url) if is_youtube_collection(url) else [url]:
+            if video_url not in seen:
+                seen.add(video_url)
+                expanded.append(video_url)
+    return expanded
+
+YOUTUBE_TRANSIENT = ('HTTP Error 429', 'HTTP Error 5', 'timed out', 'Connection reset')
+
+class YouTubeFetcher:
+    def fetch(self, url: str) -> Optional[PostData]:
+        try:
+            info = youtube_pool().extract(url)
+        except Exception as e:
+            if any(marker in str(e) for marker in YOUTUBE_TRANSIENT):
+                raise RetryableFetchError(str(e)) from e
+            raise
+        return self.post(url, info)
+
+    @staticmethod
+    def post(url: str, info: dict) -> PostData:
+        return PostData(
+            title=info.get('title') or '',
+            description=info.get('description') or '',
+            tags=info.get('tags') or [],
+            images=[info.get('thumbnail')] if info.get('thumbnail') else [],
+            platform='YouTube',
+            url=url
+        )
+
+    def fetch_many(self, urls: List[str], workers: Optional[int] = None) -> Tuple[List[PostData], List[Tuple[str, str]]]:
+        # Batch API: collections are expanded first, then every video is fetched through the pool
+        pool = youtube_pool()
+        urls = expand_urls(urls)
+        posts, failures = [], []
+        with ThreadPoolExecutor(max_workers=workers or pool.size) as executor:
+            futures = [(url, executor.submit(pool.extract, url)) for url in urls]
+            for url, future in futures:
+                try:
+                    posts.append(self.post(url, future.result()))
+                except Exception as e:
+                    failures.append((url, str(e) or e.__class__.__name__))
+        return posts, failures
+
+HEAD_CHUNK = 16 * 1024
+HEAD_MAX_BYTES = 1024 * 1024
+
+class HeadParser(HTMLParser):
+    # Collects <meta property|name=... content=...> pairs, ld+json blocks, the <title> and the
+    # canonical link without building a DOM. Given a base URL it also gathers absolute <a href>s.
+    def __init__(self, links_from: Optional[str] = None):
+        super().__init__(convert_charrefs=True)
+        self.meta = {}
+        self.ld_json = []
+        self.title = ''
+        self.canonical = ''
+        self.links: List[str] = []
+        self.head_done = False
+        self._links_from = links_from
+        self._script: Optional[List[str]] = None
+        self._title: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'meta':
+            attrs = dict(attrs)
+            key = attrs.get('property') or attrs.get('name')
+            if key and attrs.get('content') is not None:
+                self.meta.setdefault(key.lower(), attrs['content'])
+        elif tag == 'a':
+            if self._links_from is not None:
+                href = (dict(attrs).get('href') or '').strip()
+                if href and not href.startswith(('#', 'javascript:', 'mailto:', 'tel:')):
+                    self.links.append(urljoin(self._links_from, href))
+        elif tag == 'script':
+            if (dict(attrs).get('type') or '').lower() == 'application/ld+json':
+                self._script = []
+        elif tag == 'title':
+            if not self.title and not self.head_done:
+                self._title = []
+        elif tag == 'link':
+            attrs = dict(attrs)
+            if (attrs.get('rel') or '').lower() == 'canonical' and attrs.get('href'):
+                self.canonical = attrs['href']
+        elif tag == 'body':
+            self.head_done = True
+
+    def handle_data(self, data):
+        if self._script is not None:
+            self._script.append(data)
+        elif self._title is not None:
+            self._title.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'script' and self._script is not None:
+            try:
+                self.ld_json.append(json.loads(''.join(self._script)))
+            except ValueError:
+                pass
+            self._script = None
+        elif tag == 'title' and self._title is not None:
+            self.title = ' '.join(''.join(self._title).split())
+            self._title = None
+        elif tag == 'head':
+            self.head_done = True
+
+def fetch_head(url: str, wanted=(), until=None, head_only=True, links=False) -> HeadParser:
+    # Streams the page and stops feeding the parser as soon as every `wanted` meta key is seen,
+    # `until(parser)` is true, or (with head_only) </head> is reached; the rest is never downloaded.
+    # links=True reads the whole page (up to HEAD_MAX_BYTES) and collects its links.
+    import requests
+    parser = HeadParser(url if links else None)
+    try:
+        with METRICS.timed('fetch', 'connect'):
+            # A crawl needs the whole page, not a head-only prefix cached by an earlier fetch
+            response = http_client().get(url, partial_ok=not links)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise RetryableFetchError(str(e) or e.__class__.__name__) from e
+    download = METRICS.stopwatch('fetch', 'download')
+    parse = METRICS.stopwatch('fetch', 'parse')
+    with response:
+        check_retryable(response)
+        if not 200 <= response.status_code < 300:
+            # Error pages have titles too ("404 Not Found"), but they aren't posts
+            raise requests.HTTPError(f"HTTP {response.status_code} for {url}")
+        content_type = response.headers.get('Content-Type', '').lower()
+        encoding = response.encoding if 'charset' in content_type else 'utf-8'
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        received = 0
+        chunks = response.iter_content(HEAD_CHUNK)
+        while True:
+            with download:
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            received += len(chunk)
+            with parse:
+                parser.feed(decoder.decode(chunk))
+            if received >= HEAD_MAX_BYTES:
+                break
+            if links:
+                continue
+            if wanted and all(key in parser.meta for key in wanted):
+                break
+            if (until and until(parser)) or (head_only and parser.head_done):
+                break
+        chunks.close()
+    download.record()
+    parse.record()
+    METRICS.count('fetch', 'bytes', received)
+    return parser
+
+OG_KEYS = ('og:title', 'og:description', 'og:image')
+
+def og_post(url: str, platform: str, title: str, use_og_title=False) -> PostData:
+    head = fetch_head(url, wanted=OG_KEYS)
+    description = head.meta.get('og:description', '')
+    image_url = head.meta.get('og:image', '')
+    return PostData(
+        title=(head.meta.get('og:title') if use_og_title else None) or title,
+        description=description,
+        tags=re.findall(r"#(\w+)", description),
+        images=[image_url] if image_url else [],
+        platform=platform,
+        url=url
+    )
+
+def instagram_caption(head: HeadParser) -> Optional[dict]:
+    for data in head.ld_json:
+        if isinstance(data, dict) and 'caption' in data:
+            return data
+    return None
+
+class InstagramFetcher:
+    def fetch(self, url: str) -> Optional[PostData]:
+        try:
+            # The caption block may sit in <body>, so keep reading past </head> until it shows up
+            data = instagram_caption(fetch_head(url, until=instagram_caption, head_only=False))
+            if data:
+                description = data.get('caption', '')
+                image = data.get('image', '')
+                return PostData(
+                    title="Instagram Post",
+                    description=description,
+                    tags=re.findall(r"#(\w+)", description),
+                    images=[image] if image else [],
+                    platform="Instagram",
+                    url=url
+                )
+        except RetryableFetchError:
+            raise
+        except Exception as e:
+            print(f"Instagram fetch error: {e}")
+        return None
+
+class FacebookFetcher:
+    def fetch(self, url: str) -> Optional[PostData]:
+        try:
+            return og_post(url, "Facebook", "Facebook Post")
+        except RetryableFetchError:
+            raise
+        except Exception as e:
+            print(f"Facebook fetch error: {e}")
+        return None
+
+class LinkedInFetcher:
+    def fetch(self, url: str) -> Optional[PostData]:
+        try:
+            return og_post(url, "LinkedIn", "LinkedIn Post")
+        except RetryableFetchError:
+            raise
+        except Exception as e:
+            print(f"LinkedIn fetch error: {e}")
+        return None
+
+class PinterestFetcher:
+    def fetch(self, url: str) -> Optional[PostData]:
+        try:
+            return og_post(url, "Pinterest", "Pinterest Post", use_og_title=True)
+        except RetryableFetchError:
+            raise
+        except Exception as e:
+            print(f"Pinterest fetch error: {e}")
+        return None
+
+LD_SKIP_TYPES = {'organization', 'person', 'website', 'breadcrumblist', 'searchaction', 'imageobject', 'sitenavigationelement'}
+
+def ld_entities(data):
+    # Flattens JSON-LD blocks (lists and @graph containers) into their entities
+    if isinstance(data, list):
+        for item in data:
+            yield from ld_entities(item)
+    elif isinstance(data, dict):
+        if isinstance(data.get('@graph'), list):
+            yield from ld_entities(data['@graph'])
+        else:
+            yield data
+
+def ld_main_entity(head: HeadParser) -> dict:
+    # The first entity describing the page itself (an article, video, product...), not the site
+    for entity in (e for block in head.ld_json for e in ld_entities(block)):
+        types = entity.get('@type')
+        types = {str(t).lower() for t in (types if isinstance(types, list) else [types])}
+        if not types & LD_SKIP_TYPES and (entity.get('headline') or entity.get('name')):
+            return entity
+    return {}
+
+def ld_text(value) -> str:
+    if isinstance(value, list):
+        return ld_text(value[0]) if value else ''
+    if isinstance(value, dict):
+        value = value.get('name') or value.get('url') or value.get('@id')
+    return ' '.join(str(value).split()) if value else ''
+
+def ld_images(value) -> List[str]:
+    values = value if isinstance(value, list) else [value]
+    return [url for url in (ld_text(v) for v in values) if url]
+
+def generic_post(url: str, head: HeadParser) -> Optional[PostData]:
+    # OpenGraph first, then Twitter cards, JSON-LD and plain HTML. Pages with none of them
+    # (no title at all) aren't posts worth saving
+    meta = head.meta
+    entity = ld_main_entity(head)
+    title = (meta.get('og:title') or meta.get('twitter:title') or ld_text(entity.get('headline'))
+             or ld_text(entity.get('name')) or head.title)
+    if not title:
+        return None
+    description = (meta.get('og:description') or meta.get('twitter:description') or meta.get('description')
+                   or ld_text(entity.get('description')))
+    images = []
+    candidates = [meta.get('og:image'), meta.get('twitter:image')]
+    for image in candidates + ld_images(entity.get('image') or entity.get('thumbnailUrl')):
+        image = urljoin(url, image) if image else ''
+        if image and image not in images:
+            images.append(image)
+    keywords = meta.get('keywords') or entity.get('keywords') or ''
+    keywords = keywords if isinstance(keywords, list) else str(keywords).split(',')
+    tags = [str(k).strip() for k in keywords if str(k).strip()]
+    tags += [tag for tag in re.findall(r"#(\w+)", description or '') if tag not in tags]
+    platform = meta.get('og:site_name') or ld_text(entity.get('publisher')) or url_host(url) or 'Web'
+    return PostData(
+        title=' '.join(title.split()),
+        description=' '.join((description or '').split()),
+        tags=tags,
+        images=images,
+        platform=platform,
+        url=url
+    )
+
+def generic_head_done(head: HeadParser) -> bool:
+    # Stop after </head> if it held OpenGraph or JSON-LD; otherwise the JSON-LD may be in <body>
+    return head.head_done and bool(head.ld_json or 'og:title' in head.meta)
+
+class GenericFetcher:
+    def fetch(self, url: str) -> Optional[PostData]:
+        try:
+            return generic_post(url, fetch_head(url, until=generic_head_done, head_only=False))
+        except RetryableFetchError:
+            raise
+        except Exception as e:
+            print(f"Generic fetch error: {e}")
+        return None
+
+# Host suffix -> the shared fetcher for it. Fetchers keep no per-URL state, so one instance
+# of each serves every thread
+FETCHERS = {}
+GENERIC_FETCHER = GenericFetcher()
+
+def register_fetcher(suffixes, fetcher):
+    for suffix in suffixes:
+        FETCHERS[suffix.lower().lstrip('.')] = fetcher
+    fetcher_for_host.cache_clear()
+
+@functools.lru_cache(maxsize=4096)
+def fetcher_for_host(host: str):
+    # Tries the host and then each parent domain: m.youtube.com, youtube.com, com
+    parts = host.split('.')
+    for i in range(len(parts)):
+        fetcher = FETCHERS.get('.'.join(parts[i:]))
+        if fetcher is not None:
+            return fetcher
+    return GENERIC_FETCHER
+
+def detect_fetcher(url: str):
+    return fetcher_for_host((urlparse(url).hostname or '').lower())
+
+register_fetcher(('youtube.com', 'youtu.be'), YouTubeFetcher())
+register_fetcher(('instagram.com',), InstagramFetcher())
+register_fetcher(('facebook.com', 'fb.watch'), FacebookFetcher())
+register_fetcher(('linkedin.com',), LinkedInFetcher())
+register_fetcher(('pinterest.com',), PinterestFetcher())
+
+def url_host(url: str) -> str:
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+def read_urls(source: str) -> List[str]:
+    # One URL per line; '-' reads stdin. Blank lines, comments and duplicates are skipped
+    stream = sys.stdin if source == '-' else open(source, 'r')
+    try:
+        seen = set()
+        urls = []
+        for line in stream:
+            url = line.strip()
+            if url and not url.startswith('#') and url not in seen:
+                seen.add(url)
+                urls.append(url)
+        return urls
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+HOST_RATES = {
+    # Requests per second each platform tolerates before it starts answering 429
+    'facebook.com': 0.5,
+    'instagram.com': 0.5,
+    'linkedin.com': 0.5,
+    'pinterest.com': 1.0,
+    'youtube.com': 2.0,
+}
+DEFAULT_HOST_RATE = 4.0
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+
+    def take(self) -> float:
+        # Takes a token and returns 0, or returns the seconds until the next one is available
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class HostThrottle:
+    # Pacing for one host: a token bucket for the request rate, an AIMD concurrency limit that
+    # grows while latency holds and halves on throttling, and a pause window after a 429/5xx
+    def __init__(self, rate: float, max_concurrency: int):
+        self.base_rate = rate
+        self.bucket = TokenBucket(rate, burst=rate)
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = 1.0
+        self.latency: Optional[float] = None
+        self.best_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.strikes = 0
+        self.paused_until = 0.0
+
+    def ready(self, active: int) -> float:
+        # 0 when a request may start now, else seconds to wait (inf: wait for one to finish)
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if active >= int(self.limit):
+            return float('inf')
+        return self.bucket.take()
+
+    def success(self, elapsed: float):
+        self.strikes = 0
+        self.error_rate *= 0.9
+        self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+        self.best_latency = elapsed if self.best_latency is None else min(self.best_latency, elapsed)
+        if self.latency <= 2 * self.best_latency and self.error_rate < 0.1:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            # Probe above the preset rate while the host keeps answering quickly
+            self.bucket.rate = min(self.base_rate * 4, self.bucket.rate * 1.05)
+        else:
+            self.limit = max(1.0, self.limit * 0.9)
+
+    def failure(self, retry_after: Optional[float] = None):
+        self.strikes += 1
+        self.error_rate = 0.9 * self.error_rate + 0.1
+        self.limit = max(1.0, self.limit / 2)
+        self.bucket.rate = max(self.base_rate / 16, self.bucket.rate / 2)
+        pause = retry_after if retry_after is not None else backoff_delay(self.strikes, base=1.0, cap=60.0)
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+def backoff_delay(attempt: int, base=2.0, cap=900.0) -> float:
+    # Exponential with +/-50% jitter so throttled URLs don't all come back at the same moment
+    return min(cap, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+class FetchScheduler:
+    def __init__(self, rates=None, default_rate=DEFAULT_HOST_RATE, max_per_host=2):
+        self.rates = HOST_RATES if rates is None else rates
+        self.default_rate = default_rate
+        self.max_per_host = max_per_host
+        self._hosts = {}
+
+    def throttle(self, host: str) -> HostThrottle:
+        throttle = self._hosts.get(host)
+        if throttle is None:
+            rate = next((r for suffix, r in self.rates.items() if host == suffix or host.endswith('.' + suffix)),
+                        self.default_rate)
+            throttle = self._hosts[host] = HostThrottle(rate, self.max_per_host)
+        return throttle
+
+class RetryQueue:
+    # URLs whose fetch failed transiently, with their next attempt time. Saved after every change
+    # (tmp file + rename) so a later run, even after a crash, picks up where this one stopped.
+    def __init__(self, path: Optional[str] = 'retry_queue.json', max_attempts=5):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = {entry['url']: entry for entry in json.load(f)}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def due(self) -> List[dict]:
+        now = time.time()
+        return [entry for entry in self.entries.values() if entry['next_at'] <= now]
+
+    def schedule(self, url: str, group: str, error: str, retry_after: Optional[float] = None) -> Optional[float]:
+        # Returns the delay before the next attempt, or None once the URL has used up its attempts
+        entry = self.entries.get(url) or {'url': url, 'group': group, 'attempts': 0}
+        entry['attempts'] += 1
+        entry['error'] = error
+        if entry['attempts'] >= self.max_attempts:
+            self.discard(url)
+            return None
+        delay = retry_after if retry_after is not None else backoff_delay(entry['attempts'])
+        entry['next_at'] = time.time() + delay
+        self.entries[url] = entry
+        self._save()
+        return delay
+
+    def discard(self, url: str):
+        if self.entries.pop(url, None) is not None:
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(list(self.entries.values()), f)
+        os.replace(tmp, self.path)
+
+@dataclass
+class BulkReport:
+    total: int = 0
+    saved: int = 0
+    failures: List[Tuple[str, str]] = field(default_factory=list)
+    elapsed: float = 0.0
+    retried: int = 0
+    deferred: int = 0
+    unchanged: int = 0
+
+    @property
+    def throughput(self) -> float:
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        lines = [f"Fetched {self.total} URLs in {self.elapsed:.1f}s ({self.throughput:.1f} URLs/s): "
+                 f"{self.saved} saved, {len(self.failures)} failed"]
+        if self.unchanged:
+            lines.append(f"  {self.unchanged} unchanged (not rewritten)")
+        if self.retried or self.deferred:
+            lines.append(f"  {self.retried} retries, {self.deferred} URLs left in the retry queue for a later run")
+        for url, error in self.failures:
+            lines.append(f"  FAILED {url}: {error}")
+        return "\n".join(lines)
+
+class BulkIngestor:
+    def __init__(self, storage: StorageInterface, workers=8, per_host=2, batch_size=50, group="",
+                 scheduler: Optional[FetchScheduler] = None, retry_queue: Optional[RetryQueue] = None,
+                 max_wait=60.0):
+        self.storage = storage
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.group = group
+        self.expand = True
+        self.scheduler = scheduler or FetchScheduler(max_per_host=max(1, per_host))
+        self.retry_queue = retry_queue if retry_queue is not None else RetryQueue(None)
+        # Retries due within max_wait seconds happen in this run; later ones stay queued on disk
+        self.max_wait = max_wait
+
+    def _fetch(self, url: str, group: str) -> PostData:
+        fetcher = detect_fetcher(url)
+        with METRICS.timed('fetcher', type(fetcher).__name__):
+            post = fetcher.fetch(url)
+        if post is None:
+            raise ValueError("no post data extracted")
+        post.group = group
+        return post
+
+    def _start(self, report: BulkReport):
+        pass
+
+    def _accept(self, post: PostData, report: BulkReport) -> bool:
+        return True
+
+    def _failed(self, url: str):
+        pass
+
+    def _write(self, posts: List[PostData]):
+        self.storage.save_posts(posts)
+
+    def _commit(self):
+        self.storage.flush()
+
+    def run(self, urls: List[str]) -> BulkReport:
+        groups = {url: self.group for url in (expand_urls(urls) if self.expand else urls)}
+        for entry in self.retry_queue.due():
+            groups.setdefault(entry['url'], entry['group'])
+        report = BulkReport(total=len(groups))
+        self._start(report)
+        start = time.perf_counter()
+
+        # Work is queued per host and only dispatched while the host's throttle allows it,
+        # so a slow or rate-limited platform can't occupy every worker in the pool
+        pending = defaultdict(deque)
+        for url in groups:
+            pending[url_host(url)].append(url)
+        delayed = []  # heap of (monotonic due time, url) for retries within this run
+        active = defaultdict(int)
+        in_flight = {}
+        batch: List[PostData] = []
+
+        def flush():
+            if batch:
+                self._write(list(batch))
+                report.saved += len(batch)
+                batch.clear()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or in_flight or delayed:
+                now = time.monotonic()
+                while delayed and delayed[0][0] <= now:
+                    url = heapq.heappop(delayed)[1]
+                    pending[url_host(url)].append(url)
+                timeout = delayed[0][0] - now if delayed else None
+                for host in list(pending):
+                    host_urls = pending[host]
+                    throttle = self.scheduler.throttle(host)
+                    while host_urls and len(in_flight) < self.workers:
+                        wait_for = throttle.ready(active[host])
+                        if wait_for:
+                            if wait_for != float('inf'):
+                                timeout = wait_for if timeout is None else min(timeout, wait_for)
+                            break
+                        url = host_urls.popleft()
+                        in_flight[pool.submit(self._fetch, url, groups[url])] = (host, url, time.monotonic())
+                        active[host] += 1
+                    if not host_urls:
+                        del pending[host]
+
+                if not in_flight:
+                    time.sleep(timeout or 0)
+                    continue
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    host, url, started = in_flight.pop(future)
+                    active[host] -= 1
+                    throttle = self.scheduler.throttle(host)
+                    try:
+                        post = future.result()
+                    except RetryableFetchError as e:
+                        throttle.failure(e.retry_after)
+                        delay = self.retry_queue.schedule(url, groups[url], str(e), e.retry_after)
+                        if delay is None:
+                            report.failures.append((url, f"gave up after retries: {e}"))
+                            self._failed(url)
+                        elif delay <= self.max_wait:
+                            report.retried += 1
+                            heapq.heappush(delayed, (time.monotonic() + delay, url))
+                        else:
+                            report.deferred += 1
+                    except Exception as e:
+                        self.retry_queue.discard(url)
+                        report.failures.append((url, str(e) or e.__class__.__name__))
+                        self._failed(url)
+                    else:
+                        throttle.success(time.monotonic() - started)
+                        self.retry_queue.discard(url)
+                        if self._accept(post, report):
+                            batch.append(post)
+                if len(batch) >= self.batch_size:
+                    flush()
+            flush()
+        self._commit()
+
+        report.elapsed = time.perf_counter() - start
+        return report
+
+def content_hash(post) -> str:
+    # Covers the fetched fields only; the group is the user's and never comes from a fetch
+    fields = [post.title, post.platform, post.description, post.tags, post.images]
+    return hashlib.sha1(json.dumps(fields, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class RefreshState:
+    # When each post was last re-fetched and the hash of what came back. Kept in its own small
+    # SQLite file so every storage backend can use it without a schema or format change.
+    def __init__(self, path='refresh.db'):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS refresh (url TEXT PRIMARY KEY, checked REAL, hash TEXT)')
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def stale(self, urls, max_age: float, limit: Optional[int] = None) -> List[str]:
+        # Never-checked posts come first, then the ones checked longest ago
+        with self._lock:
+            checked = dict(self.conn.execute('SELECT url, checked FROM refresh'))
+        cutoff = time.time() - max_age
+        candidates = ((checked.get(url, 0.0), i, url) for i, url in enumerate(urls))
+        candidates = [c for c in candidates if c[0] <= cutoff]
+        ordered = heapq.nsmallest(limit, candidates) if limit else sorted(candidates)
+        return [url for _, _, url in ordered]
+
+    def hash(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute('SELECT hash FROM refresh WHERE url = ?', (url,)).fetchone()
+        return row[0] if row else None
+
+    def mark(self, rows: List[Tuple[str, Optional[str]]]):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'INSERT INTO refresh (url, checked, hash) VALUES (?, ?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET checked = excluded.checked, '
+                'hash = COALESCE(excluded.hash, refresh.hash)',
+                [(url, now, digest) for url, digest in rows])
+
+    def close(self):
+        self.conn.close()
+
+class RefreshJob(BulkIngestor):
+    # Re-fetches stale posts through the same throttled pipeline as bulk ingestion, but only
+    # records whose content hash changed are written back (as single-record updates)
+    def __init__(self, storage: StorageInterface, state: RefreshState, max_age=7 * 24 * 3600, apply=None, **kwargs):
+        super().__init__(storage, **kwargs)
+        self.state = state
+        self.max_age = max_age
+        # apply(post) replaces storage.update_post, e.g. to hand changes to the GUI thread
+        self.apply = apply
+        self.expand = False
+        self._stored = {}
+        self._marks: List[Tuple[str, Optional[str]]] = []
+
+    def select(self, limit: Optional[int] = None) -> List[str]:
+        # Reads the storage, so call it on the thread that owns it; run() then never touches it
+        # except to write changes (or not at all when apply is given)
+        urls = self.state.stale(self.storage.post_urls(), self.max_age, limit)
+        self._stored = self.storage.get_posts(urls)
+        return urls
+
+    def refresh(self, limit: Optional[int] = None) -> BulkReport:
+        return self.run(self.select(limit))
+
+    def _fetch(self, url: str, group: str) -> PostData:
+        stored = self._stored.get(url)
+        return super()._fetch(url, stored.group if stored else group)
+
+    def _accept(self, post: PostData, report: BulkReport) -> bool:
+        digest = content_hash(post)
+        previous = self.state.hash(post.url)
+        if previous is None and post.url in self._stored:
+            previous = content_hash(self._stored[post.url])
+        self._marks.append((post.url, digest))
+        if len(self._marks) >= self.batch_size:
+            self._flush_marks()
+        if digest == previous:
+            report.unchanged += 1
+            return False
+        return True
+
+    def _failed(self, url: str):
+        # Dead links are marked checked too, so they don't stay at the front of the queue
+        self._marks.append((url, None))
+
+    def _write(self, posts: List[PostData]):
+        for post in posts:
+            if self.apply is not None:
+                self.apply(post)
+            else:
+                self.storage.update_post(post)
+        self._flush_marks()
+
+    def _commit(self):
+        self._flush_marks()
+        if self.apply is None:
+            self.storage.flush()
+
+    def _flush_marks(self):
+        if self._marks:
+            self.state.mark(self._marks)
+            self._marks = []
+
+def url_key(url: str) -> bytes:
+    # 16 bytes per URL, so sets of seen URLs stay small next to the URLs themselves
+    return hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        return (f"Read {self.read} posts in {self.elapsed:.1f}s: {self.added} added, {self.updated} updated, "
+                f"{self.unchanged} unchanged, {self.duplicates} duplicates, {self.invalid} invalid")
+
+class VaultImport:
+    # Merges an export into a vault, deduplicating by URL. NDJSON files (a {"groups": [...]}
+    # line, then one post per line) are streamed in batches; the older single-document
+    # {"posts": [...], "groups": [...]} format has to be parsed whole.
+    #
+    # batches() only reads the file and may run on a worker thread; merge() writes to the
+    # storage and belongs on the thread that owns it.
+    def __init__(self, storage: StorageInterface, path: str, batch_size=1000):
+        self.storage = storage
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.total_bytes = os.path.getsize(path)
+        self.bytes_read = 0
+        self.report = ImportReport()
+        self._seen = set()
+        self._existing = None
+
+    def _record(self, data):
+        try:
+            if not data.get('url') or not isinstance(data['url'], str):
+                raise ValueError('no url')
+            tags, images = data.get('tags') or [], data.get('images') or []
+            if not isinstance(tags, list) or not isinstance(images, list):
+                raise TypeError('tags and images must be lists')
+            post = self.storage.record_type(
+                url=data['url'], title=str(data.get('title') or ''), platform=str(data.get('platform') or ''),
+                description=str(data.get('description') or ''), tags=[str(t) for t in tags],
+                images=[str(i) for i in images], group=str(data.get('group') or ''))
+        except (AttributeError, TypeError, ValueError):
+            self.report.invalid += 1
+            return None
+        self.report.read += 1
+        key = url_key(post.url)
+        if key in self._seen:
+            # The first copy of a URL in the file wins
+            self.report.duplicates += 1
+            return None
+        self._seen.add(key)
+        return post
+
+    def batches(self, cancel: Optional[threading.Event] = None):
+        # Yields (posts, groups) until the file is done or cancel is set
+        with open(self.path, 'rb') as f:
+            first = f.readline()
+            try:
+                header = json.loads(first) if first.strip() else {}
+            except ValueError:
+                header = None
+            if header is None or (isinstance(header, dict) and 'posts' in header):
+                f.seek(0)
+                yield from self._document(json.load(f), cancel)
+                return
+
+            # The header line is optional, so the first line may already be a post
+            is_header = isinstance(header, dict) and 'groups' in header and 'url' not in header
+            groups = [str(g) for g in header['groups']] if is_header else []
+            posts = []
+            self.bytes_read = len(first)
+            if not is_header and first.strip():
+                post = self._record(header)
+                if post is not None:
+                    posts.append(post)
+            for line in f:
+                if cancel is not None and cancel.is_set():
+                    return
+                self.bytes_read += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    self.report.invalid += 1
+                    continue
+                post = self._record(data)
+                if post is not None:
+                    posts.append(post)
+                if len(posts) >= self.batch_size:
+                    yield posts, groups
+                    posts, groups = [], []
+            if posts or groups:
+                yield posts, groups
+
+    def _document(self, data, cancel):
+        if not isinstance(data, dict):
+            raise ValueError("not a vault export: expected NDJSON or a {\"posts\": [...]} document")
+        self.bytes_read = self.total_bytes
+        groups = [str(g) for g in data.get('groups', [])]
+        records = data.get('posts', [])
+        for start in range(0, len(records), self.batch_size):
+            if cancel is not None and cancel.is_set():
+                return
+            posts = [post for post in map(self._record, records[start:start + self.batch_size]) if post is not None]
+            yield posts, groups
+            groups = []
+
+    def merge(self, posts, groups) -> Tuple[List, List]:
+        # Returns (added, updated) as (new posts, [(old, new), ...]). Imported posts without a
+        # group keep the group they already have in the vault
+        for name in groups:
+            self.storage.add_group(name)
+        if self._existing is None:
+            self._existing = {url_key(url) for url in self.storage.post_urls()}
+        new = [post for post in posts if url_key(post.url) not in self._existing]
+        known = [post for post in posts if url_key(post.url) in self._existing]
+        stored = self.storage.get_posts([post.url for post in known]) if known else {}
+        changed = []
+        updates = []
+        for post in known:
+            old = stored.get(post.url)
+            if old is None:
+                new.append(post)
+                continue
+            if not post.group:
+                post.group = old.group
+            if post_to_dict(post) == post_to_dict(old):
+                self.report.unchanged += 1
+            else:
+                updates.append(post)
+                changed.append((old, post))
+        if updates:
+            self.storage.update_posts(updates)
+            self.report.updated += len(updates)
+        if new:
+            self.storage.save_posts(new)
+            self._existing.update(url_key(post.url) for post in new)
+            self.report.added += len(new)
+        return new, changed
+
+    def run(self, progress=None, cancel: Optional[threading.Event] = None) -> ImportReport:
+        # progress(bytes_read, total_bytes) is called after every batch
+        start = time.perf_counter()
+        for posts, groups in self.batches(cancel):
+            with METRICS.timed('import', 'merge'):
+                self.merge(posts, groups)
+            if progress is not None:
+                progress(self.bytes_read, self.total_bytes)
+        self.storage.flush()
+        self.report.elapsed = time.perf_counter() - start
+        return self.report
+
+def export_posts(posts, groups: List[str], path: str, total: Optional[int] = None, progress=None,
+                 cancel: Optional[threading.Event] = None) -> int:
+    # Streams posts to NDJSON, or to the single-document format when the path ends in .json.
+    # Written to a temp file first, so a cancelled or failed export never leaves half a file.
+    # progress(written, total) is called every thousand posts.
+    document = path.lower().endswith('.json')
+    tmp = f'{path}.{threading.get_ident()}.tmp'
+    written = 0
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write('{"posts": [\n' if document else json.dumps({'groups': list(groups)}) + '\n')
+            for post in posts:
+                if cancel is not None and cancel.is_set():
+                    raise InterruptedError('export cancelled')
+                if document and written:
+                    f.write(',\n')
+                f.write(json.dumps(post_to_dict(post), ensure_ascii=False))
+                if not document:
+                    f.write('\n')
+                written += 1
+                if progress is not None and written % 1000 == 0:
+                    progress(written, total)
+            if document:
+                f.write('\n], "groups": %s}\n' % json.dumps(list(groups), ensure_ascii=False))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    if progress is not None:
+        progress(written, total)
+    return written
+
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'igshid')
+CRAWL_SKIP_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.pdf', '.zip', '.gz', '.mp3',
+                         '.mp4', '.webm', '.css', '.js', '.json', '.xml', '.rss', '.woff', '.woff2')
+
+def normalize_url(url: str) -> str:
+    # One spelling per page: lowercase scheme and host, no default port, fragment, tracking
+    # parameters or trailing slash, and the query sorted
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or (scheme, port) in (('http', 80), ('https', 443)) else f'{host}:{port}'
+    path = re.sub('/{2,}', '/', parsed.path) or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+                             if not k.lower().startswith(TRACKING_PARAMS)))
+    return urlunparse((scheme, netloc, path, '', query, ''))
+
+class BloomFilter:
+    # k bit positions per key, derived from two halves of the key's 16-byte digest
+    def __init__(self, capacity=1_000_000, error_rate=0.01):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: bytes):
+        h1 = int.from_bytes(key[:8], 'little')
+        h2 = int.from_bytes(key[8:16], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.bits[i >> 3] & (1 << (i & 7)) for i in self._positions(key))
+
+    def add(self, key: bytes) -> bool:
+        # Returns whether the key may have been added before
+        present = True
+        for i in self._positions(key):
+            mask = 1 << (i & 7)
+            if not self.bits[i >> 3] & mask:
+                present = False
+                self.bits[i >> 3] |= mask
+        return present
+
+class SeenURLs:
+    # Every normalized URL a crawl has queued or found in the vault. The Bloom filter answers
+    # "never seen" in memory; only its maybes are checked against the exact index, a table of
+    # 16-byte keys. With a path the index persists, so later crawls skip what earlier ones saw.
+    def __init__(self, path: Optional[str] = None, capacity=1_000_000):
+        self.bloom = BloomFilter(capacity)
+        self.conn = sqlite3.connect(path or ':memory:')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS seen (key BLOB PRIMARY KEY) WITHOUT ROWID')
+        for key, in self.conn.execute('SELECT key FROM seen'):
+            self.bloom.add(key)
+        self.index_lookups = 0
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def __contains__(self, url: str) -> bool:
+        key = url_key(normalize_url(url))
+        return key in self.bloom and self._indexed(key)
+
+    def _indexed(self, key: bytes) -> bool:
+        self.index_lookups += 1
+        return self.conn.execute('SELECT 1 FROM seen WHERE key = ?', (key,)).fetchone() is not None
+
+    def add(self, url: str) -> bool:
+        # Returns True if the URL is new
+        key = url_key(normalize_url(url))
+        if self.bloom.add(key) and self._indexed(key):
+            return False
+        self.conn.execute('INSERT INTO seen (key) VALUES (?)', (key,))
+        return True
+
+    def add_many(self, urls):
+        keys = []
+        for url in urls:
+            key = url_key(normalize_url(url))
+            self.bloom.add(key)
+            keys.append((key,))
+            if len(keys) >= 10000:
+                self.conn.executemany('INSERT OR IGNORE INTO seen (key) VALUES (?)', keys)
+                keys = []
+        self.conn.executemany('INSERT OR IGNORE INTO seen (key) VALUES (?)', keys)
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+class Crawler(BulkIngestor):
+    # Follows links from seed pages breadth first, one depth level per run(), through the same
+    # throttled pipeline as bulk ingestion. Only pages handled by the generic fetcher have their
+    # links followed; known platforms are saved like any bulk URL.
+    def __init__(self, storage: StorageInterface, seen: SeenURLs, max_depth=1, max_pages=500,
+                 domains: Optional[List[str]] = None, **kwargs):
+        super().__init__(storage, **kwargs)
+        self.expand = False
+        self.seen = seen
+        self.max_depth = max(0, max_depth)
+        self.max_pages = max(1, max_pages)
+        # Without explicit domains a crawl stays on its seeds' sites (and their subdomains)
+        self.domains = [d.lower().lstrip('.') for d in domains] if domains else None
+        self._follow = False
+        self._links: List[str] = []
+        self._links_lock = threading.Lock()
+        self._known = set()
+
+    def allowed(self, url: str) -> bool:
+        parsed = urlparse(url)
+        host = (parsed.hostname or '').lower()
+        return (parsed.scheme in ('http', 'https') and not parsed.path.lower().endswith(CRAWL_SKIP_EXTENSIONS)
+                and any(host == d or host.endswith('.' + d) for d in self.domains))
+
+    def _fetch(self, url: str, group: str) -> PostData:
+        if not self._follow or detect_fetcher(url) is not GENERIC_FETCHER:
+            return super()._fetch(url, group)
+        with METRICS.timed('fetcher', 'Crawler'):
+            head = fetch_head(url, links=True)
+        with self._links_lock:
+            self._links.extend(head.links)
+        post = generic_post(url, head)
+        if post is None:
+            raise ValueError("no post data extracted")
+        post.group = group
+        return post
+
+    def _accept(self, post: PostData, report: BulkReport) -> bool:
+        # Seeds already in the vault are crawled for their links but not stored twice
+        if post.url in self._known:
+            report.unchanged += 1
+            return False
+        return True
+
+    def crawl(self, seeds: List[str]) -> BulkReport:
+        if self.domains is None:
+            hosts = ((urlparse(seed).hostname or '').lower() for seed in seeds)
+            self.domains = sorted({host[4:] if host.startswith('www.') else host for host in hosts})
+        self.seen.add_many(self.storage.post_urls())
+        level = []
+        for seed in dict.fromkeys(normalize_url(seed) for seed in seeds):
+            if not self.seen.add(seed):
+                self._known.add(seed)
+            level.append(seed)
+
+        total = BulkReport()
+        for depth in range(self.max_depth + 1):
+            level = level[:self.max_pages - total.total]
+            if not level:
+                break
+            self._follow = depth < self.max_depth
+            self._links = []
+            report = self.run(level)
+            total.total += report.total
+            total.saved += report.saved
+            total.failures += report.failures
+            total.elapsed += report.elapsed
+            total.retried += report.retried
+            total.deferred += report.deferred
+            total.unchanged += report.unchanged
+
+            # Links are only marked seen once they fit in the page budget, so a later crawl
+            # with a bigger budget can still reach the rest
+            level = []
+            budget = self.max_pages - total.total
+            for link in self._links:
+                if len(level) >= budget:
+                    break
+                link = normalize_url(link)
+                if self.allowed(link) and self.seen.add(link):
+                    level.append(link)
+            self.seen.commit()
+        return total
@@ -0,0 +1,599 @@
+import ipaddress
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from itertools import islice
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.request import Request, urlopen
+from vault_core import (METRICS, POST_FIELDS, BulkIngestor, BulkReport, FetchScheduler, PostData, RetryQueue,
+                        StorageInterface, post_to_dict)
+
+# A long-running process that keeps the vault loaded and the fetchers, HTTP pools and caches
+# warm, serving a small JSON API on localhost. Storages aren't thread-safe, so every storage
+# call runs on one dedicated thread; ingestion jobs run one after another on another.
+
+DEFAULT_LISTEN = '127.0.0.1:8765'
+DEFAULT_URL = 'http://' + DEFAULT_LISTEN
+MAX_PAGE_SIZE = 5000
+MAX_JOB_EVENTS = 10000  # per job; clients that fall further behind only miss per-URL events
+MAX_FINISHED_JOBS = 100  # older finished jobs are forgotten, so a long-running daemon stays flat
+EXPORT_CHUNK = 1000
+
+class DaemonError(Exception):
+    pass
+
+def decode_post(data: dict) -> PostData:
+    if not isinstance(data, dict) or not data.get('url'):
+        raise ValueError('a post needs at least a url')
+    fields = {'title': '', 'platform': '', 'description': '', 'tags': [], 'images': [], 'group': ''}
+    fields.update((k, data[k]) for k in POST_FIELDS if k in data)
+    if not isinstance(fields['tags'], list) or not isinstance(fields['images'], list):
+        raise ValueError('tags and images must be lists')
+    return PostData(**fields)
+
+class IngestJob:
+    def __init__(self, job_id: int, urls: List[str], group: str):
+        self.id = job_id
+        self.urls = urls
+        self.group = group
+        self.status = 'queued'
+        self.total = len(urls)
+        self.fetched = 0
+        self.failed = 0
+        self.saved = 0
+        self.report: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.events = deque(maxlen=MAX_JOB_EVENTS)
+        self.next_seq = 0
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'error')
+
+    def emit(self, event: str, **fields):
+        with self._changed:
+            if event in ('done', 'error'):
+                # Set together with the final event so streams never end before it
+                self.status = event
+            self.events.append(dict(seq=self.next_seq, event=event, job=self.id, **fields))
+            self.next_seq += 1
+            self._changed.notify_all()
+
+    def events_since(self, seq: int, timeout: float) -> List[dict]:
+        # Blocks until there is something after `seq` or the job has finished
+        with self._changed:
+            self._changed.wait_for(lambda: self.next_seq > seq or self.finished, timeout)
+            return [e for e in self.events if e['seq'] >= seq]
+
+    def to_dict(self) -> dict:
+        return {'id': self.id, 'status': self.status, 'group': self.group, 'total': self.total,
+                'fetched': self.fetched, 'failed': self.failed, 'saved': self.saved,
+                'events': self.next_seq, 'created': self.created, 'report': self.report, 'error': self.error}
+
+class DaemonIngestor(BulkIngestor):
+    # Reports progress on the job and hands every write to the daemon's storage thread
+    def __init__(self, daemon: 'VaultDaemon', job: IngestJob, **kwargs):
+        super().__init__(daemon.storage, group=job.group, **kwargs)
+        self.daemon = daemon
+        self.job = job
+
+    def _start(self, report: BulkReport):
+        self.job.total = report.total
+        self.job.emit('started', total=report.total)
+
+    def _accept(self, post: PostData, report: BulkReport) -> bool:
+        self.job.fetched += 1
+        self.job.emit('fetched', url=post.url, title=post.title, platform=post.platform)
+        return True
+
+    def _failed(self, url: str):
+        self.job.failed += 1
+        self.job.emit('failed', url=url)
+
+    def _write(self, posts: List[PostData]):
+        self.daemon.call(self.storage.save_posts, posts)
+        self.job.saved += len(posts)
+        self.job.emit('saved', count=len(posts), saved=self.job.saved)
+
+    def _commit(self):
+        self.daemon.call(self.storage.flush)
+
+class VaultDaemon:
+    def __init__(self, open_storage: Callable[[], StorageInterface], listen=DEFAULT_LISTEN, workers=8,
+                 batch_size=50, scheduler: Optional[FetchScheduler] = None,
+                 retry_queue: Optional[RetryQueue] = None):
+        self._storage_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vault-storage')
+        # Opened on the storage thread too, since SQLite connections belong to their thread
+        self.storage = self.call(open_storage)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.scheduler = scheduler or FetchScheduler()
+        self.retry_queue = retry_queue if retry_queue is not None else RetryQueue(None)
+        self.jobs = {}
+        self._job_ids = 0
+        self._jobs_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._job_thread = threading.Thread(target=self._run_jobs, name='vault-jobs', daemon=True)
+        self.started = time.time()
+
+        host, _, port = listen.rpartition(':')
+        self.httpd = ThreadingHTTPServer((host or '127.0.0.1', int(port)), self._handler())
+        self.httpd.daemon_threads = True
+        self.address = f'http://{self.httpd.server_address[0]}:{self.httpd.server_address[1]}'
+        self.host_names = {'localhost', host.lower().strip('[]')} - {''}
+
+    def allowed_host(self, header: Optional[str]) -> bool:
+        # Against DNS rebinding: a page can point its own domain at 127.0.0.1, but the browser
+        # still sends that domain as Host. Only IP literals and the names we listen on get through.
+        name, _, port = (header or '').lower().rpartition(':')
+        if not name or ']' in port:
+            name, port = (header or '').lower(), ''
+        if port and port != str(self.httpd.server_address[1]):
+            return False
+        name = name.strip('[]')
+        if name in self.host_names:
+            return True
+        try:
+            ipaddress.ip_address(name)
+        except ValueError:
+            return False
+        return True
+
+    def call(self, fn, *args, **kwargs):
+        return self._storage_thread.submit(fn, *args, **kwargs).result()
+
+    def serve_forever(self):
+        self._job_thread.start()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        # Safe from any thread but the one in serve_forever()
+        self.httpd.shutdown()
+
+    def close(self):
+        self._queue.put(None)
+        self.httpd.server_close()
+        self.call(self.storage.flush)
+        close = getattr(self.storage, 'close', None)
+        if close is not None:
+            self.call(close)
+        self._storage_thread.shutdown()
+
+    def submit(self, urls: List[str], group='') -> IngestJob:
+        with self._jobs_lock:
+            self._job_ids += 1
+            job = IngestJob(self._job_ids, list(dict.fromkeys(urls)), group)
+            self.jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def _run_jobs(self):
+        # One job at a time: they share the host throttles and the retry queue file
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.status = 'running'
+            try:
+                ingestor = DaemonIngestor(self, job, workers=self.workers, batch_size=self.batch_size,
+                                          scheduler=self.scheduler, retry_queue=self.retry_queue)
+                job.report = asdict(ingestor.run(job.urls))
+                job.emit('done', report=job.report)
+            except Exception as e:
+                job.error = str(e) or e.__class__.__name__
+                job.emit('error', error=job.error)
+            self._evict_jobs()
+
+    def _evict_jobs(self):
+        # Streams already following an evicted job keep their reference and still see it end
+        with self._jobs_lock:
+            finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+            for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self.jobs[job_id]
+
+    def status(self) -> dict:
+        with self._jobs_lock:
+            jobs = list(self.jobs.values())
+        return {'posts': self.call(self.storage.count_posts), 'groups': len(self.call(self.storage.all_groups)),
+                'storage': type(self.storage).__name__, 'uptime': round(time.time() - self.started, 1),
+                'jobs': {state: sum(job.status == state for job in jobs)
+                         for state in ('queued', 'running', 'done', 'error')}}
+
+    def chunks(self, items, encode):
+        # Reads a chunk at a time on the storage thread, so the vault is never copied whole
+        try:
+            while True:
+                chunk = self.call(lambda: list(islice(items, EXPORT_CHUNK)))
+                if not chunk:
+                    return
+                yield ''.join(json.dumps(encode(item)) + '\n' for item in chunk)
+        finally:
+            close = getattr(items, 'close', None)
+            if close is not None:
+                self.call(close)
+
+    def query(self, params: dict) -> dict:
+        text = params.get('text', '')
+        # An empty group parameter means "posts without a group"; leaving it out means any group
+        group = params.get('group')
+        platform = params.get('platform') or None
+        sort_by = params.get('sort', 'title')
+        limit = min(max(int(params.get('limit', 50)), 0), MAX_PAGE_SIZE)
+        offset = max(int(params.get('offset', 0)), 0)
+
+        def run():
+            total = self.storage.count_posts(text, group=group, platform=platform)
+            posts = self.storage.query_posts(text, group=group, platform=platform, sort_by=sort_by,
+                                             limit=limit, offset=offset)
+            return total, [post_to_dict(p) for p in posts]
+        total, posts = self.call(run)
+        return {'total': total, 'offset': offset, 'limit': limit, 'posts': posts}
+
+    def _handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload, content_type='application/json'):
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self) -> dict:
+                length = int(self.headers.get('Content-Length') or 0)
+                data = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(data, dict):
+                    raise ValueError('the request body must be a JSON object')
+                return data
+
+            def _stream(self, lines):
+                # NDJSON with no length; the connection closes when the stream ends
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    for chunk in lines:
+                        self.wfile.write(chunk.encode('utf-8'))
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _dispatch(self, method: str):
+                parsed = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(parsed.query, keep_blank_values=True).items()}
+                parts = [p for p in parsed.path.split('/') if p]
+                if not daemon.allowed_host(self.headers.get('Host')):
+                    self.close_connection = True  # the body, if any, is left unread
+                    self._send(403, {'error': 'unexpected Host header'})
+                    return
+                # Form posts and text/plain fetches skip the CORS preflight, so any web page could
+                # send them; requiring JSON means a browser has to ask first, and we never say yes
+                if method in ('POST', 'PUT') and self.headers.get_content_type() != 'application/json':
+                    self.close_connection = True
+                    self._send(415, {'error': 'the request body must be application/json'})
+                    return
+                try:
+                    with METRICS.timed('daemon', method + ' /' + (parts[0] if parts else '')):
+                        self._route(method, parts, params)
+                except (ValueError, TypeError, KeyError) as e:
+                    self._send(400, {'error': str(e) or e.__class__.__name__})
+                except Exception as e:
+                    self._send(500, {'error': str(e) or e.__class__.__name__})
+
+            def _route(self, method, parts, params):
+                storage = daemon.storage
+                route = (method, parts[0] if parts else '', len(parts))
+                if route == ('GET', 'status', 1):
+                    self._send(200, daemon.status())
+                elif route == ('GET', 'metrics', 1):
+                    self._send(200, METRICS.to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+                elif route == ('GET', 'posts', 1):
+                    self._send(200, daemon.query(params))
+                elif route == ('GET', 'posts', 2) and parts[1] == 'export':
+                    self._stream(daemon.chunks(daemon.call(storage.iter_posts, EXPORT_CHUNK), post_to_dict))
+                elif route == ('GET', 'posts', 2) and parts[1] == 'urls':
+                    self._stream(daemon.chunks(daemon.call(storage.post_urls), str))
+                elif route == ('POST', 'posts', 2) and parts[1] == 'lookup':
+                    urls = [str(u) for u in self._body()['urls']][:MAX_PAGE_SIZE]
+                    found = daemon.call(storage.get_posts, urls)
+                    self._send(200, {'posts': [post_to_dict(p) for p in found.values()]})
+                elif route == ('POST', 'posts', 1):
+                    posts = [decode_post(p) for p in self._body()['posts']]
+                    daemon.call(storage.save_posts, posts)
+                    self._send(200, {'saved': len(posts)})
+                elif route == ('PUT', 'posts', 1):
+                    body = self._body()
+                    posts = [decode_post(p) for p in body['posts']] if 'posts' in body else [decode_post(body['post'])]
+                    daemon.call(storage.update_posts, posts)
+                    self._send(200, {'updated': len(posts)})
+                elif route == ('DELETE', 'posts', 1):
+                    daemon.call(storage.delete_post, params['url'])
+                    self._send(200, {'deleted': 1})
+                elif route == ('GET', 'groups', 1):
+                    self._send(200, {'groups': list(daemon.call(storage.all_groups))})
+                elif route == ('POST', 'groups', 1):
+                    daemon.call(storage.add_group, str(self._body()['name']))
+                    self._send(200, {'groups': list(daemon.call(storage.all_groups))})
+                elif route == ('POST', 'replace', 1):
+                    body = self._body()
+                    posts = [decode_post(p) for p in body['posts']]
+                    daemon.call(storage.replace_all, posts, [str(g) for g in body.get('groups', [])])
+                    self._send(200, {'posts': len(posts)})
+                elif route == ('POST', 'flush', 1):
+                    daemon.call(storage.flush)
+                    self._send(200, {'flushed': True})
+                elif route == ('POST', 'jobs', 1):
+                    body = self._body()
+                    urls = [str(u).strip() for u in body['urls'] if str(u).strip()]
+                    job = daemon.submit(urls, str(body.get('group') or ''))
+                    self._send(202, job.to_dict())
+                elif route == ('GET', 'jobs', 1):
+                    with daemon._jobs_lock:
+                        jobs = list(daemon.jobs.values())
+                    self._send(200, {'jobs': [job.to_dict() for job in jobs]})
+                elif route[:2] == ('GET', 'jobs') and route[2] in (2, 3):
+                    job = daemon.jobs.get(int(parts[1]))
+                    if job is None:
+                        self._send(404, {'error': f'no job {parts[1]}'})
+                    elif route[2] == 2:
+                        self._send(200, job.to_dict())
+                    elif parts[2] == 'events':
+                        self._stream(self._events(job, int(params.get('since', 0))))
+                    else:
+                        self._send(404, {'error': 'not found'})
+                else:
+                    self._send(404, {'error': 'not found'})
+
+            @staticmethod
+            def _events(job: IngestJob, seq: int):
+                while True:
+                    events = job.events_since(seq, timeout=15)
+                    if events:
+                        seq = events[-1]['seq'] + 1
+                        yield ''.join(json.dumps(e) + '\n' for e in events)
+                    elif not job.finished:
+                        # Keeps idle streams alive through proxies and tells clients we're still here
+                        yield json.dumps({'event': 'heartbeat', 'job': job.id}) + '\n'
+                    if job.finished and seq >= job.next_seq:
+                        return
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_PUT(self):
+                self._dispatch('PUT')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+        return Handler
+
+class VaultClient:
+    def __init__(self, base_url=DEFAULT_URL, timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _open(self, method: str, path: str, params: Optional[dict] = None, body: Optional[dict] = None,
+              timeout: Optional[float] = None):
+        url = self.base_url + path
+        if params:
+            url += '?' + urlencode({k: v for k, v in params.items() if v is not None})
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+        try:
+            return urlopen(request, timeout=timeout or self.timeout)
+        except HTTPError as e:
+            try:
+                message = json.loads(e.read() or b'{}').get('error') or e.reason
+            except ValueError:
+                message = e.reason
+            raise DaemonError(f'{method} {path}: {message} (HTTP {e.code})') from None
+        except URLError as e:
+            raise DaemonError(f'no vault daemon at {self.base_url}: {e.reason}') from None
+
+    def _json(self, method: str, path: str, params: Optional[dict] = None, body: Optional[dict] = None) -> dict:
+        with self._open(method, path, params, body) as response:
+            return json.loads(response.read())
+
+    def _lines(self, path: str, params: Optional[dict] = None):
+        # The daemon sends a heartbeat at least every 15 seconds, so a longer timeout means it's gone
+        with self._open('GET', path, params, timeout=max(self.timeout, 60)) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+
+    def status(self) -> dict:
+        return self._json('GET', '/status')
+
+    def query(self, text='', group=None, platform=None, sort_by='title', limit=50, offset=0) -> dict:
+        return self._json('GET', '/posts', {'text': text, 'group': group, 'platform': platform, 'sort': sort_by,
+                                            'limit': limit, 'offset': offset})
+
+    def export(self):
+        for data in self._lines('/posts/export'):
+            yield decode_post(data)
+
+    def urls(self):
+        return self._lines('/posts/urls')
+
+    def lookup(self, urls: List[str]) -> List[PostData]:
+        return [decode_post(p) for p in self._json('POST', '/posts/lookup', body={'urls': list(urls)})['posts']]
+
+    def groups(self) -> List[str]:
+        return self._json('GET', '/groups')['groups']
+
+    def save_posts(self, posts: List[PostData]) -> dict:
+        return self._json('POST', '/posts', body={'posts': [post_to_dict(p) for p in posts]})
+
+    def update_post(self, post: PostData) -> dict:
+        return self._json('PUT', '/posts', body={'post': post_to_dict(post)})
+
+    def update_posts(self, posts: List[PostData]) -> dict:
+        return self._json('PUT', '/posts', body={'posts': [post_to_dict(p) for p in posts]})
+
+    def delete_post(self, url: str) -> dict:
+        return self._json('DELETE', '/posts', {'url': url})
+
+    def add_group(self, name: str) -> dict:
+        return self._json('POST', '/groups', body={'name': name})
+
+    def replace_all(self, posts: List[PostData], groups: List[str]) -> dict:
+        return self._json('POST', '/replace', body={'posts': [post_to_dict(p) for p in posts], 'groups': groups})
+
+    def flush(self) -> dict:
+        return self._json('POST', '/flush')
+
+    def submit(self, urls: List[str], group='') -> dict:
+        return self._json('POST', '/jobs', body={'urls': list(urls), 'group': group})
+
+    def job(self, job_id: int) -> dict:
+        return self._json('GET', f'/jobs/{job_id}')
+
+    def jobs(self) -> List[dict]:
+        return self._json('GET', '/jobs')['jobs']
+
+    def events(self, job_id: int, since=0):
+        # Yields progress events until the job's final 'done' or 'error' event
+        for event in self._lines(f'/jobs/{job_id}/events', {'since': since}):
+            if event['event'] != 'heartbeat':
+                yield event
+
+    def ingest(self, urls: List[str], group='', on_event: Optional[Callable[[dict], None]] = None) -> BulkReport:
+        # Submits a job and follows it to the end, like BulkIngestor.run() but in the daemon
+        job = self.submit(urls, group)
+        for event in self.events(job['id']):
+            if on_event is not None:
+                on_event(event)
+            if event['event'] == 'error':
+                raise DaemonError(f"job {job['id']} failed: {event['error']}")
+            if event['event'] == 'done':
+                report = dict(event['report'])
+                report['failures'] = [tuple(f) for f in report['failures']]
+                return BulkReport(**report)
+        raise DaemonError(f"lost the progress stream of job {job['id']}")
+
+class RemoteStorage(StorageInterface):
+    # Lets PostApp and the CLI work against a running daemon. The lists returned by
+    # all_posts()/all_groups() are kept in step with the changes made through it.
+    def __init__(self, client: VaultClient):
+        self.client = client
+        self.record_type = PostData
+        self.posts: List[PostData] = []
+        self.groups: List[str] = []
+        self._loaded = False
+
+    def save_post(self, post: PostData):
+        self.save_posts([post])
+
+    def save_posts(self, posts: List[PostData]):
+        self.client.save_posts(posts)
+        if self._loaded:
+            # As in the daemon's storage, a known URL is updated in place and keeps its group
+            # when the new post has none
+            positions = {p.url: i for i, p in enumerate(self.posts)}
+            for post in posts:
+                i = positions.get(post.url)
+                if i is None:
+                    positions[post.url] = len(self.posts)
+                    self.posts.append(post)
+                else:
+                    if not post.group:
+                        post.group = self.posts[i].group
+                    self.posts[i] = post
+                if post.group and post.group not in self.groups:
+                    self.groups.append(post.group)
+
+    def update_post(self, post: PostData):
+        self.client.update_post(post)
+        if self._loaded:
+            self.posts[:] = [post if p.url == post.url else p for p in self.posts]
+
+    def update_posts(self, posts: List[PostData]):
+        self.client.update_posts(posts)
+        if self._loaded:
+            replaced = {post.url: post for post in posts}
+            self.posts[:] = [replaced.pop(p.url, p) for p in self.posts]
+            self.posts.extend(replaced.values())
+
+    def delete_post(self, url: str):
+        self.client.delete_post(url)
+        if self._loaded:
+            self.posts[:] = [p for p in self.posts if p.url != url]
+
+    def add_group(self, name: str):
+        if name and name not in self.groups:
+            self.groups[:] = self.client.add_group(name)['groups']
+
+    def replace_all(self, posts: List[PostData], groups: List[str]):
+        self.client.replace_all(posts, groups)
+        self.posts = list(posts)
+        self.groups = list(groups)
+
+    def flush(self):
+        self.client.flush()
+
+    def get_all_posts(self) -> List[PostData]:
+        return list(self.client.export())
+
+    def iter_posts(self, batch_size=1000):
+        return self.client.export()
+
+    def snapshot_posts(self):
+        # The export stream is plain HTTP, so any thread can read it
+        return self.client.export()
+
+    def post_urls(self):
+        return self.client.urls()
+
+    def get_posts(self, urls) -> dict:
+        urls = list(urls)
+        found = {}
+        for start in range(0, len(urls), MAX_PAGE_SIZE):
+            found.update((post.url, post) for post in self.client.lookup(urls[start:start + MAX_PAGE_SIZE]))
+        return found
+
+    def query_posts(self, text='', group=None, platform=None, sort_by='title', limit=100, offset=0) -> List[PostData]:
+        posts = []
+        while len(posts) < limit:
+            page = self.client.query(text, group=group, platform=platform, sort_by=sort_by,
+                                     limit=min(limit - len(posts), MAX_PAGE_SIZE), offset=offset + len(posts))
+            posts.extend(decode_post(p) for p in page['posts'])
+            if len(page['posts']) < page['limit'] or not page['posts']:
+                break
+        return posts
+
+    def count_posts(self, text='', group=None, platform=None) -> int:
+        return self.client.query(text, group=group, platform=platform, limit=0)['total']
+
+    def all_posts(self):
+        self._loaded = True
+        self.posts = self.get_all_posts()
+        return self.posts
+
+    def all_groups(self):
+        self.groups = self.client.groups()
+        return self.groups
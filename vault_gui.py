@@ -0,0 +1,851 @@
+import os
+import json
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from PyQt5 import QtWidgets, QtCore, QtGui
+from vault_core import (CACHE_DIR, METRICS, PostData, RefreshJob, RefreshState, SearchIndex, StorageInterface,
+                        VaultImport, detect_fetcher, export_posts, http_client)
+
+class FetchQueue(QtCore.QObject):
+    # Signals are emitted from worker threads and delivered queued on the GUI thread
+    started = QtCore.pyqtSignal(str)
+    finished = QtCore.pyqtSignal(str, object)
+    failed = QtCore.pyqtSignal(str, str)
+    cancelled = QtCore.pyqtSignal(str)
+
+    def __init__(self, workers=4, parent=None):
+        super().__init__(parent)
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._jobs = {}  # url -> (future, cancel event)
+        self.finished.connect(self._forget)
+        self.failed.connect(self._forget)
+        self.cancelled.connect(self._forget)
+
+    def enqueue(self, url: str, group: str = "") -> bool:
+        if url in self._jobs:
+            return False
+        cancel_event = threading.Event()
+        future = self._pool.submit(self._run, url, group, cancel_event)
+        self._jobs[url] = (future, cancel_event)
+        return True
+
+    def cancel(self, url: str):
+        job = self._jobs.get(url)
+        if job is None:
+            return
+        future, cancel_event = job
+        cancel_event.set()
+        # Jobs that haven't started are dropped here; running ones report back when the fetch returns
+        if future.cancel():
+            self.cancelled.emit(url)
+
+    def cancel_all(self):
+        for url in list(self._jobs):
+            self.cancel(url)
+
+    def pending(self) -> int:
+        return len(self._jobs)
+
+    def shutdown(self):
+        self.cancel_all()
+        self._pool.shutdown(wait=False)
+
+    def _run(self, url, group, cancel_event):
+        if cancel_event.is_set():
+            self.cancelled.emit(url)
+            return
+        self.started.emit(url)
+        try:
+            fetcher = detect_fetcher(url)
+            with METRICS.timed('fetcher', type(fetcher).__name__):
+                post = fetcher.fetch(url)
+            if post is None:
+                raise ValueError("no post data extracted")
+            post.group = group
+        except Exception as e:
+            if cancel_event.is_set():
+                self.cancelled.emit(url)
+            else:
+                self.failed.emit(url, str(e) or e.__class__.__name__)
+            return
+        if cancel_event.is_set():
+            self.cancelled.emit(url)
+        else:
+            self.finished.emit(url, post)
+
+    def _forget(self, url, *_):
+        self._jobs.pop(url, None)
+
+THUMB_WIDTH = 160
+THUMB_HEIGHT = 120
+
+class ThumbnailDiskCache:
+    # Already-downscaled thumbnails keyed by image URL, with the validators needed to revalidate them
+    def __init__(self, directory=os.path.join(CACHE_DIR, 'thumbnails'), max_age=7 * 24 * 3600):
+        self.directory = directory
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return base + '.png', base + '.json'
+
+    def get(self, url) -> Tuple[Optional[QtGui.QImage], dict]:
+        image_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None, {}
+        image = QtGui.QImage(image_path)
+        return (None, {}) if image.isNull() else (image, meta)
+
+    def is_fresh(self, meta) -> bool:
+        return time.time() - meta.get('checked', 0) < self.max_age
+
+    def put(self, url, image: QtGui.QImage, etag=None, last_modified=None):
+        image_path, meta_path = self._paths(url)
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        # Write to per-thread temp files and rename, so a reader never sees a half-written entry
+        # and a stale and a current request for the same URL can't trip over each other
+        tmp_image = image_path + f'.{threading.get_ident()}.tmp'
+        if image.save(tmp_image, 'PNG'):
+            os.replace(tmp_image, image_path)
+            self.touch(url, {'url': url, 'etag': etag, 'last_modified': last_modified})
+
+    def touch(self, url, meta):
+        _, meta_path = self._paths(url)
+        meta = dict(meta, checked=time.time())
+        tmp_meta = meta_path + f'.{threading.get_ident()}.tmp'
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, meta_path)
+
+class ImageLoader(QtCore.QObject):
+    # Fixed-size pool shared by every table refresh. Each refresh starts a new generation and
+    # queued downloads from older generations are cancelled before they hit the network.
+    finished = QtCore.pyqtSignal(int, int, str, QtGui.QImage)
+    error = QtCore.pyqtSignal(int, int, str)
+
+    def __init__(self, workers=4, memory_budget_kb=64 * 1024, parent=None):
+        super().__init__(parent)
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._futures = []
+        self.generation = 0
+        self.disk = ThumbnailDiskCache()
+        # Scaled pixmaps stay in Qt's LRU pixmap cache, bounded by memory_budget_kb
+        QtGui.QPixmapCache.setCacheLimit(memory_budget_kb)
+
+    def reset(self) -> int:
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+        self.generation += 1
+        return self.generation
+
+    def cached(self, url: str) -> Optional[QtGui.QPixmap]:
+        return QtGui.QPixmapCache.find('thumb:' + url)
+
+    def remember(self, url: str, image: QtGui.QImage) -> QtGui.QPixmap:
+        pixmap = QtGui.QPixmap.fromImage(image)
+        QtGui.QPixmapCache.insert('thumb:' + url, pixmap)
+        return pixmap
+
+    def request(self, row: int, url: str):
+        self._futures.append(self._pool.submit(self._load, self.generation, row, url))
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self.generation
+
+    def shutdown(self):
+        self.reset()
+        self._pool.shutdown(wait=False)
+
+    def _load(self, generation, row, url):
+        if not self.is_current(generation):
+            return
+        with METRICS.timed('image', 'disk_read'):
+            image, meta = self.disk.get(url)
+        if image is not None:
+            self.finished.emit(generation, row, url, image)
+            if self.disk.is_fresh(meta):
+                METRICS.count('image', 'disk_hit')
+                return
+        try:
+            with METRICS.timed('image', 'download'):
+                with http_client().get(url, timeout=10, validators=meta) as resp:
+                    if resp.status_code == 304 and image is not None:
+                        METRICS.count('image', 'not_modified')
+                        self.disk.touch(url, meta)
+                        return
+                    resp.raise_for_status()
+                    content = resp.content
+            # Decode and downscale here; QPixmap is GUI-thread only so only QImage crosses over
+            with METRICS.timed('image', 'decode'):
+                full = QtGui.QImage()
+                if not full.loadFromData(content):
+                    raise Exception("Failed to load image")
+                thumb = full.scaled(THUMB_WIDTH, THUMB_HEIGHT, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+            self.disk.put(url, thumb, resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+            METRICS.count('image', 'downloaded')
+            self.finished.emit(generation, row, url, thumb)
+        except Exception as e:
+            METRICS.count('image', 'failed')
+            print(f"Image load error for row {row}, url {url}: {e}")
+            if image is None:
+                self.error.emit(generation, row, url)
+
+class PostTableModel(QtCore.QAbstractTableModel):
+    HEADERS = ["Image", "Title", "Platform", "Tags", "Description", "URL", "Group", "Delete"]
+
+    # Cells are formatted on demand, so only rows the view actually paints cost anything,
+    # and thumbnails are requested the first time a visible row asks for one
+    def __init__(self, image_loader: 'ImageLoader', parent=None):
+        super().__init__(parent)
+        self.image_loader = image_loader
+        self._rows: List[PostData] = []
+        self._requested = set()
+        self._failed = set()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            return self.HEADERS[section]
+        return section + 1
+
+    def post(self, row: int) -> PostData:
+        return self._rows[row]
+
+    def set_rows(self, rows: List[PostData]):
+        self.beginResetModel()
+        self._rows = rows
+        self.drop_pending_images()
+        self.endResetModel()
+
+    def drop_pending_images(self):
+        # Cancels queued thumbnails; rows still on screen ask again on their next paint
+        self.image_loader.reset()
+        self._requested.clear()
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == QtCore.Qt.TextAlignmentRole:
+            return QtCore.Qt.AlignCenter
+        post = self._rows[index.row()]
+        column = index.column()
+        if column == 0:
+            return self._image_data(index.row(), post, role)
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if column == 1:
+            return post.title
+        elif column == 2:
+            return post.platform
+        elif column == 3:
+            return ", ".join(post.tags)
+        elif column == 4:
+            return post.description[:100]
+        elif column == 5:
+            return post.url
+        elif column == 6:
+            return post.group
+        return "Delete"
+
+    def _image_data(self, row, post, role):
+        if not post.images:
+            return "No Image" if role == QtCore.Qt.DisplayRole else None
+        url = post.images[0]
+        if role == QtCore.Qt.DecorationRole:
+            pixmap = self.image_loader.cached(url)
+            if pixmap is None and url not in self._requested and url not in self._failed:
+                self._requested.add(url)
+                self.image_loader.request(row, url)
+            return pixmap
+        if role == QtCore.Qt.DisplayRole:
+            return "Image Error" if url in self._failed else "Loading..."
+        return None
+
+    def thumbnail_ready(self, url: str, failed=False):
+        self._requested.discard(url)
+        if failed:
+            self._failed.add(url)
+        if self._rows:
+            # The view only repaints the visible part of this range
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self._rows) - 1, 0))
+
+class ThumbnailDelegate(QtWidgets.QStyledItemDelegate):
+    def paint(self, painter, option, index):
+        pixmap = index.data(QtCore.Qt.DecorationRole)
+        if pixmap is None:
+            super().paint(painter, option, index)
+            return
+        style = option.widget.style() if option.widget else QtWidgets.QApplication.style()
+        style.drawPrimitive(QtWidgets.QStyle.PE_PanelItemViewItem, option, painter, option.widget)
+        rect = QtWidgets.QStyle.alignedRect(option.direction, QtCore.Qt.AlignCenter, pixmap.size(), option.rect)
+        painter.drawPixmap(rect, pixmap)
+
+class ButtonDelegate(QtWidgets.QStyledItemDelegate):
+    # Paints a push button in every cell of its column without creating a widget per row
+    clicked = QtCore.pyqtSignal(QtCore.QModelIndex)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pressed = None
+
+    def paint(self, painter, option, index):
+        button = QtWidgets.QStyleOptionButton()
+        button.rect = option.rect.adjusted(4, 4, -4, -4)
+        button.text = index.data()
+        button.state = QtWidgets.QStyle.State_Enabled
+        if self._pressed == (index.row(), index.column()):
+            button.state |= QtWidgets.QStyle.State_Sunken
+        else:
+            button.state |= QtWidgets.QStyle.State_Raised
+        style = option.widget.style() if option.widget else QtWidgets.QApplication.style()
+        style.drawControl(QtWidgets.QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QtCore.QEvent.MouseButtonPress and event.button() == QtCore.Qt.LeftButton:
+            self._pressed = (index.row(), index.column())
+            return True
+        if event.type() == QtCore.QEvent.MouseButtonRelease and self._pressed is not None:
+            pressed, self._pressed = self._pressed, None
+            if pressed == (index.row(), index.column()) and option.rect.contains(event.pos()):
+                self.clicked.emit(index)
+            return True
+        return False
+
+class RefreshWorker(QtCore.QObject):
+    # Runs a RefreshJob on a plain thread; changed posts come back through `changed` so the
+    # storage and search index are only ever touched on the GUI thread
+    changed = QtCore.pyqtSignal(object)
+    done = QtCore.pyqtSignal(object)
+
+    def __init__(self, storage: StorageInterface, max_age=7 * 24 * 3600, parent=None):
+        super().__init__(parent)
+        self.job = RefreshJob(storage, RefreshState(), max_age=max_age, apply=self.changed.emit)
+        self._thread: Optional[threading.Thread] = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, limit: Optional[int] = None) -> int:
+        urls = self.job.select(limit)
+        self._thread = threading.Thread(target=lambda: self.done.emit(self.job.run(urls)), daemon=True)
+        self._thread.start()
+        return len(urls)
+
+class ImportWorker(QtCore.QObject):
+    # Reads and parses the file on a plain thread; each batch is merged into the storage on the
+    # GUI thread. At most two batches wait at a time, so memory stays flat however big the file
+    batch = QtCore.pyqtSignal(object, object)
+    progress = QtCore.pyqtSignal(int)
+    done = QtCore.pyqtSignal(object)
+
+    def __init__(self, storage: StorageInterface, path: str, parent=None):
+        super().__init__(parent)
+        self.importer = VaultImport(storage, path)
+        self.cancelled = threading.Event()
+        self._slots = threading.Semaphore(2)
+        self._started = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        error = None
+        try:
+            for posts, groups in self.importer.batches(self.cancelled):
+                while not self._slots.acquire(timeout=0.1):
+                    if self.cancelled.is_set():
+                        break
+                else:
+                    self.batch.emit(posts, groups)
+                    total = self.importer.total_bytes
+                    self.progress.emit(self.importer.bytes_read * 100 // total if total else 100)
+                    continue
+                break
+        except Exception as e:
+            error = e
+        self.done.emit(error)
+
+    def merge(self, posts, groups) -> Tuple[List[PostData], List[Tuple[PostData, PostData]]]:
+        try:
+            return self.importer.merge(posts, groups)
+        finally:
+            self._slots.release()
+
+    def report(self):
+        self.importer.report.elapsed = time.perf_counter() - self._started
+        return self.importer.report
+
+class ExportWorker(QtCore.QObject):
+    # Writes the storage's snapshot_posts() on a plain thread, so the export stays consistent
+    # while the user keeps working
+    progress = QtCore.pyqtSignal(int)
+    done = QtCore.pyqtSignal(object)
+
+    def __init__(self, storage: StorageInterface, path: str, parent=None):
+        super().__init__(parent)
+        self.posts = storage.snapshot_posts()
+        self.total = storage.count_posts()
+        self.groups = list(storage.all_groups())
+        self.path = path
+        self.cancelled = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        try:
+            result = export_posts(self.posts, self.groups, self.path, total=self.total,
+                                  progress=lambda done, total: self.progress.emit(done * 100 // max(total, 1)),
+                                  cancel=self.cancelled)
+        except Exception as e:
+            result = e
+        self.done.emit(result)
+
+class PostApp(QtWidgets.QMainWindow):
+    def __init__(self, storage: StorageInterface):
+        super().__init__()
+        
+        self.setWindowIcon(QtGui.QIcon('icon.png'))
+        
+        self.setWindowTitle("Post Viewer with Groups")
+        self.resize(1280, 720)
+
+
+
+        self.storage = storage
+        self._posts: Optional[List[PostData]] = None
+        self.groups: List[str] = storage.all_groups()
+        # Built on first use: a freshly opened vault can show its presorted snapshot order without it
+        self.index: Optional[SearchIndex] = None
+
+        # Saves are coalesced: mutations schedule one write a moment later instead of saving each time
+        self._save_timer = QtCore.QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(1000)
+        self._save_timer.timeout.connect(self.save_now)
+
+        # Results arriving in quick succession are shown with one refresh
+        self._refresh_timer = QtCore.QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(150)
+        self._refresh_timer.timeout.connect(self.update_display)
+
+        self.fetch_queue = FetchQueue(workers=4, parent=self)
+        self.fetch_queue.started.connect(self.on_fetch_started)
+        self.fetch_queue.finished.connect(self.on_fetch_finished)
+        self.fetch_queue.failed.connect(self.on_fetch_failed)
+        self.fetch_queue.cancelled.connect(self.on_fetch_cancelled)
+        self._queue_items = {}  # url -> QListWidgetItem
+        self._queue_total = 0
+        self._queue_done = 0
+
+        self.image_loader = ImageLoader(workers=4, parent=self)
+        self.image_loader.finished.connect(self.on_image_loaded)
+        self.image_loader.error.connect(self.on_image_error)
+
+        # Widgets
+        self.group_list = QtWidgets.QListWidget()
+        self.group_list.setMaximumWidth(150)
+        self.group_list.addItem("All")
+        for g in self.groups:
+            self.group_list.addItem(g)
+        self.group_list.currentItemChanged.connect(self.update_display)
+
+        self.url_input = QtWidgets.QLineEdit()
+        self.url_input.setPlaceholderText("Enter post URL (paste several to queue them all)")
+        self.url_input.returnPressed.connect(self.add_post)
+        self.add_btn = QtWidgets.QPushButton("Add Post")
+        self.add_btn.clicked.connect(self.add_post)
+
+        self.group_input = QtWidgets.QComboBox()
+        self.group_input.setMinimumWidth(100)
+        self.group_input.addItem("")  # No group
+        self.group_input.addItems(self.groups)
+
+        self.new_group_input = QtWidgets.QLineEdit()
+        self.new_group_input.setPlaceholderText("New group name")
+        self.new_group_input.setMaximumWidth(100)
+        self.new_group_btn = QtWidgets.QPushButton("Add Group")
+        self.new_group_btn.setMaximumWidth(75)
+        self.new_group_btn.clicked.connect(self.add_group)
+
+        self.filter_input = QtWidgets.QLineEdit()
+        self.filter_input.setPlaceholderText("Filter by text or tag")
+        # Typing is debounced so a burst of keystrokes costs one search
+        self._filter_timer = QtCore.QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(150)
+        self._filter_timer.timeout.connect(self.update_display)
+        self.filter_input.textChanged.connect(self._filter_timer.start)
+
+        self.sort_box = QtWidgets.QComboBox()
+        self.sort_box.addItems(["Title", "Platform", "Group"])
+        self.sort_box.currentIndexChanged.connect(self.update_display)
+
+        self.export_btn = QtWidgets.QPushButton("Export")
+        self.export_btn.clicked.connect(self.export_json)
+        self.import_btn = QtWidgets.QPushButton("Import")
+        self.import_btn.setToolTip("Merge an NDJSON or JSON export into the vault; posts already saved are updated")
+        self.import_btn.clicked.connect(self.import_json)
+        self.refresh_btn = QtWidgets.QPushButton("Refresh Stale")
+        self.refresh_btn.setToolTip("Re-fetch posts not checked in the last week and update the ones that changed")
+        self.refresh_btn.clicked.connect(self.refresh_stale)
+        self.refresh_worker: Optional[RefreshWorker] = None
+        self.import_worker: Optional[ImportWorker] = None
+        self.export_worker: Optional[ExportWorker] = None
+
+        # Table
+        self.model = PostTableModel(self.image_loader, self)
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.model)
+        self.table.setWordWrap(False)
+        # Fixed row heights let the view skip measuring rows, which keeps huge vaults cheap
+        self.table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(THUMB_HEIGHT)
+        self.table.setItemDelegateForColumn(0, ThumbnailDelegate(self.table))
+        self.delete_delegate = ButtonDelegate(self.table)
+        self.delete_delegate.clicked.connect(lambda index: self.delete_post(self.model.post(index.row()).url))
+        self.table.setItemDelegateForColumn(7, self.delete_delegate)
+        for column, width in enumerate([THUMB_WIDTH, 200, 90, 120, 200, 100, 100, 60]):
+            self.table.setColumnWidth(column, width)
+
+        # Once scrolling settles, thumbnails queued for rows that went off screen are dropped
+        self._scroll_timer = QtCore.QTimer(self)
+        self._scroll_timer.setSingleShot(True)
+        self._scroll_timer.setInterval(100)
+        self._scroll_timer.timeout.connect(self.on_scroll_settled)
+        self.table.verticalScrollBar().valueChanged.connect(self._scroll_timer.start)
+        
+        # Fetch queue
+        self.queue_list = QtWidgets.QListWidget()
+        self.queue_list.setMaximumHeight(90)
+        self.queue_list.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.queue_progress = QtWidgets.QProgressBar()
+        self.queue_progress.setFormat("%v / %m fetched")
+        self.cancel_btn = QtWidgets.QPushButton("Cancel")
+        self.cancel_btn.setToolTip("Cancel the selected fetches, or all of them if none are selected")
+        self.cancel_btn.clicked.connect(self.cancel_fetches)
+        self.queue_list.hide()
+        self.queue_progress.hide()
+        self.cancel_btn.hide()
+
+        # Layouts
+        controls_layout = QtWidgets.QHBoxLayout()
+        controls_layout.addWidget(self.url_input)
+        controls_layout.addWidget(self.group_input)
+        controls_layout.addWidget(self.add_btn)
+
+        group_add_layout = QtWidgets.QHBoxLayout()
+        group_add_layout.addWidget(self.new_group_input)
+        group_add_layout.addWidget(self.new_group_btn)
+
+        filter_sort_layout = QtWidgets.QHBoxLayout()
+        filter_sort_layout.addWidget(self.filter_input)
+        filter_sort_layout.addWidget(self.sort_box)
+        filter_sort_layout.addWidget(self.export_btn)
+        filter_sort_layout.addWidget(self.import_btn)
+        filter_sort_layout.addWidget(self.refresh_btn)
+
+        left_layout = QtWidgets.QVBoxLayout()
+        left_layout.addWidget(QtWidgets.QLabel("Groups"))
+        left_layout.addWidget(self.group_list)
+        left_layout.addLayout(group_add_layout)
+
+        main_layout = QtWidgets.QHBoxLayout()
+        main_layout.addLayout(left_layout)
+        right_layout = QtWidgets.QVBoxLayout()
+        right_layout.addLayout(controls_layout)
+        right_layout.addLayout(filter_sort_layout)
+        right_layout.addWidget(self.table)
+        queue_layout = QtWidgets.QHBoxLayout()
+        queue_layout.addWidget(self.queue_progress)
+        queue_layout.addWidget(self.cancel_btn)
+        right_layout.addWidget(self.queue_list)
+        right_layout.addLayout(queue_layout)
+        main_layout.addLayout(right_layout)
+
+        container = QtWidgets.QWidget()
+        container.setLayout(main_layout)
+        self.setCentralWidget(container)
+
+        self.update_display()
+
+    @property
+    def posts(self) -> List[PostData]:
+        # Only the in-memory SearchIndex needs every post, so storages that filter in place
+        # (search_posts()) are never loaded whole
+        if self._posts is None:
+            self._posts = self.storage.all_posts()
+        return self._posts
+
+    @QtCore.pyqtSlot(int, int, str, QtGui.QImage)
+    def on_image_loaded(self, generation, row, url, image):
+        # Cache even if the row has scrolled away; it will be wanted again
+        self.image_loader.remember(url, image)
+        self.model.thumbnail_ready(url)
+
+    @QtCore.pyqtSlot(int, int, str)
+    def on_image_error(self, generation, row, url):
+        self.model.thumbnail_ready(url, failed=True)
+
+    def on_scroll_settled(self):
+        self.model.drop_pending_images()
+        self.table.viewport().update()
+
+    def detect_fetcher(self, url: str):
+        return detect_fetcher(url)
+
+    def add_post(self):
+        urls = self.url_input.text().split()
+        if not urls:
+            return
+        group = self.group_input.currentText()
+        if group and group not in self.groups:
+            self.storage.add_group(group)
+            self.group_list.addItem(group)
+            self.group_input.addItem(group)
+            self.schedule_save()
+        for url in urls:
+            if self.fetch_queue.enqueue(url, group):
+                item = QtWidgets.QListWidgetItem(f"Queued: {url}")
+                item.setData(QtCore.Qt.UserRole, url)
+                self.queue_list.addItem(item)
+                self._queue_items[url] = item
+                self._queue_total += 1
+        self.url_input.clear()
+        self.update_queue_progress()
+
+    def _finish_queue_item(self, url, status=None):
+        item = self._queue_items.pop(url, None)
+        if item is None:
+            return
+        if status is None:
+            self.queue_list.takeItem(self.queue_list.row(item))
+        else:
+            item.setText(f"{status}: {url}")
+        self._queue_done += 1
+        self.update_queue_progress()
+
+    @QtCore.pyqtSlot(str)
+    def on_fetch_started(self, url):
+        item = self._queue_items.get(url)
+        if item is not None:
+            item.setText(f"Fetching: {url}")
+
+    @QtCore.pyqtSlot(str, object)
+    def on_fetch_finished(self, url, post):
+        # The index is only built when search_posts() is unsupported, and those storages hand
+        # out their own list from all_posts(), so save_post() updates it too. A URL saved
+        # before is replaced, so its old record must leave the index first
+        if self.index is not None:
+            for old in [p for p in self.posts if p.url == post.url]:
+                self.index.remove(old)
+        self.storage.save_post(post)
+        if self.index is not None:
+            self.index.add(post)
+        self._finish_queue_item(url)
+        self.schedule_save()
+        self._refresh_timer.start()
+
+    def refresh_stale(self):
+        if self.refresh_worker is None:
+            self.refresh_worker = RefreshWorker(self.storage, parent=self)
+            self.refresh_worker.changed.connect(self.on_post_refreshed)
+            self.refresh_worker.done.connect(self.on_refresh_done)
+        if self.refresh_worker.is_running():
+            return
+        count = self.refresh_worker.start()
+        self.refresh_btn.setEnabled(False)
+        self.refresh_btn.setText(f"Refreshing {count}...")
+
+    def on_post_refreshed(self, post):
+        if self.index is not None:
+            for old in [p for p in self.posts if p.url == post.url]:
+                self.index.remove(old)
+        self.storage.update_post(post)
+        if self.index is not None:
+            self.index.add(post)
+        self.schedule_save()
+        self._refresh_timer.start()
+
+    def on_refresh_done(self, report):
+        self.statusBar().showMessage(report.summary())
+        self.refresh_btn.setEnabled(True)
+        self.refresh_btn.setText("Refresh Stale")
+
+    @QtCore.pyqtSlot(str, str)
+    def on_fetch_failed(self, url, error):
+        self.statusBar().showMessage(f"Fetch failed for {url}: {error}", 10000)
+        self._finish_queue_item(url, f"Failed ({error})")
+
+    @QtCore.pyqtSlot(str)
+    def on_fetch_cancelled(self, url):
+        self._finish_queue_item(url)
+
+    def cancel_fetches(self):
+        selected = [item.data(QtCore.Qt.UserRole) for item in self.queue_list.selectedItems()]
+        if selected:
+            for url in selected:
+                self.fetch_queue.cancel(url)
+        else:
+            self.fetch_queue.cancel_all()
+
+    def update_queue_progress(self):
+        if not self._queue_items:
+            # Batch is over: keep failed entries visible, reset the counters for the next one
+            self._queue_total = self._queue_done = 0
+        active = bool(self._queue_items)
+        self.queue_progress.setMaximum(max(self._queue_total, 1))
+        self.queue_progress.setValue(self._queue_done)
+        self.queue_progress.setVisible(active)
+        self.cancel_btn.setVisible(active)
+        self.queue_list.setVisible(self.queue_list.count() > 0)
+
+    def schedule_save(self):
+        self._save_timer.start()
+
+    def save_now(self):
+        # Each change was already handed to the storage; this makes the pending ones durable
+        self._save_timer.stop()
+        self.storage.flush()
+
+    def closeEvent(self, event):
+        for worker in (self.import_worker, self.export_worker):
+            if worker is not None:
+                worker.cancelled.set()
+        self.fetch_queue.shutdown()
+        self.image_loader.shutdown()
+        if self._save_timer.isActive():
+            self.save_now()
+        super().closeEvent(event)
+
+    def add_group(self):
+        new_group = self.new_group_input.text().strip()
+        if new_group and new_group not in self.groups:
+            self.storage.add_group(new_group)
+            self.group_list.addItem(new_group)
+            self.group_input.addItem(new_group)
+            self.schedule_save()
+            self.new_group_input.clear()
+
+    def update_display(self):
+        filter_text = self.filter_input.text().lower()
+        sort_by = self.sort_box.currentText().lower()
+        selected_group_item = self.group_list.currentItem()
+        selected_group = selected_group_item.text() if selected_group_item else "All"
+
+        self._filter_timer.stop()
+        group = None if selected_group == "All" else selected_group
+        filtered = None
+        with METRICS.timed('view', 'update_display'):
+            if self.index is None and not filter_text and group is None:
+                filtered = self.storage.ordered_posts(sort_by)
+            if filtered is None and self.index is None:
+                # SQLite filters in the database, so no in-memory index is built for it
+                with METRICS.timed('view', 'search'):
+                    filtered = self.storage.search_posts(filter_text, group=group, sort_by=sort_by)
+            if filtered is None:
+                if self.index is None:
+                    with METRICS.timed('view', 'index_build'):
+                        self.index = SearchIndex(self.posts)
+                with METRICS.timed('view', 'search'):
+                    filtered = self.index.search(filter_text, group=group, sort_by=sort_by)
+            with METRICS.timed('view', 'set_rows'):
+                self.model.set_rows(filtered)
+
+    def delete_post(self, url):
+        if self.index is not None:
+            for post in self.posts:
+                if post.url == url:
+                    self.index.remove(post)
+        self.storage.delete_post(url)
+        self.schedule_save()
+        self.update_display()
+
+    def export_json(self):
+        if self.export_worker is not None:
+            self.export_worker.cancelled.set()
+            return
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export Posts", "",
+                                                        "NDJSON Files (*.ndjson *.jsonl);;JSON Files (*.json)")
+        if path:
+            self.export_worker = ExportWorker(self.storage, path, parent=self)
+            self.export_worker.progress.connect(lambda percent: self.export_btn.setText(f"Cancel Export ({percent}%)"))
+            self.export_worker.done.connect(self.on_export_done)
+            self.export_btn.setText("Cancel Export")
+            self.export_worker.start()
+
+    def on_export_done(self, result):
+        if isinstance(result, Exception) and not self.export_worker.cancelled.is_set():
+            QtWidgets.QMessageBox.warning(self, "Export Error", f"Failed to export: {result}")
+        self.export_worker = None
+        self.export_btn.setText("Export")
+
+    def import_json(self):
+        if self.import_worker is not None:
+            self.import_worker.cancelled.set()
+            return
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Import Posts", "",
+                                                        "Vault exports (*.ndjson *.jsonl *.json);;All Files (*)")
+        if path:
+            try:
+                self.import_worker = ImportWorker(self.storage, path, parent=self)
+            except OSError as e:
+                QtWidgets.QMessageBox.warning(self, "Import Error", f"Failed to import: {e}")
+                return
+            self.import_worker.batch.connect(self.on_import_batch)
+            self.import_worker.progress.connect(lambda percent: self.import_btn.setText(f"Cancel Import ({percent}%)"))
+            self.import_worker.done.connect(self.on_import_done)
+            self.import_btn.setText("Cancel Import")
+            self.import_worker.start()
+
+    def on_import_batch(self, posts, groups):
+        # Merged into the existing vault: new URLs are added, known ones updated in place
+        if self.import_worker is None:
+            return
+        try:
+            added, updated = self.import_worker.merge(posts, groups)
+        except Exception as e:
+            self.import_worker.cancelled.set()
+            QtWidgets.QMessageBox.warning(self, "Import Error", f"Failed to import: {e}")
+            return
+        for name in groups:
+            self._add_group_items(name)
+        for post in added:
+            self._add_group_items(post.group)
+        if added or updated:
+            # Rebuilding the index once at the end beats adding thousands of posts to it one by
+            # one; the table is refreshed when the import is done
+            self.index = None
+            self.schedule_save()
+
+    def on_import_done(self, error):
+        worker, self.import_worker = self.import_worker, None
+        self.import_btn.setText("Import")
+        self.save_now()
+        if error is not None:
+            QtWidgets.QMessageBox.warning(self, "Import Error", f"Failed to import: {error}")
+        self.statusBar().showMessage(worker.report().summary())
+        self.update_display()
+
+    def _add_group_items(self, name):
+        if name and self.group_list.findItems(name, QtCore.Qt.MatchExactly) == []:
+            self.group_list.addItem(name)
+            self.group_input.addItem(name)